@@ -1,24 +1,75 @@
-from crewai import Agent, Task, Crew
+try:
+    # Optional: the agents only call the OpenAI API themselves, crewai just gives
+    # them their role/goal metadata
+    from crewai import Agent
+except ImportError:
+    class Agent:
+        """Keeps the role/goal fields crewai's Agent would hold."""
+
+        def __init__(self, **fields):
+            self.__dict__.update(fields)
 import openai
 import os
 from dotenv import load_dotenv
 import json
+import asyncio
+import sys
+from analysis_checks import MISSING_INSIGHT, REQUIRED_INSIGHT_KEYS, check_analysis
+from prompt_builder import compact_json, count_tokens, prompt_metrics, trim_feedback
+from telemetry import LLM_TOKENS, span
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Get OpenAI API key from environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in .env file.")
 openai.api_key = OPENAI_API_KEY
 
-REQUIRED_INSIGHT_KEYS = [
-    "engagementRateInsight",
-    "reachInsight",
-    "breakdownInsight",
-    "summaryInsight"
-]
+# Per-call timeout and overall latency budget (seconds) of the async pipeline, and how
+# many candidate analyses it generates and evaluates concurrently per round
+AGENT_CALL_TIMEOUT = float(os.getenv("AGENT_CALL_TIMEOUT", "20"))
+AGENT_LATENCY_BUDGET = float(os.getenv("AGENT_LATENCY_BUDGET", "60"))
+AGENT_CANDIDATES = int(os.getenv("AGENT_CANDIDATES", "1"))
+
+# How analyses are evaluated: "hybrid" runs the local checks (analysis_checks) and
+# asks the LLM only about analyses that pass them, "local" trusts the local checks
+# alone, "llm" sends every analysis to the LLM evaluator
+EVALUATOR_MODE = os.getenv("EVALUATOR_MODE", "hybrid")
+
+_async_client = None
+
+
+def require_api_key():
+    """The OpenAI key, checked on the first LLM call rather than at import so the module always loads."""
+    if not OPENAI_API_KEY:
+        raise ValueError("OPENAI_API_KEY not found in environment variables. Please set it in .env file.")
+    return OPENAI_API_KEY
+
+
+def async_client():
+    """AsyncOpenAI client shared within the running event loop.
+
+    Honours OPENAI_BASE_URL, e.g. to point the agents at a local fake endpoint.
+    """
+    global _async_client
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client[0] is not loop:
+        _async_client = (loop, openai.AsyncOpenAI(api_key=require_api_key()))
+    return _async_client[1]
+
+def report_usage(agent_name, prompt, response):
+    """Log the prompt/completion token counts of one LLM call and add them to llm_tokens_total."""
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or count_tokens(prompt)
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    print(f"[DEBUG] {agent_name} call: {prompt_tokens} prompt tokens, {completion_tokens} completion tokens.",
+          file=sys.stderr)
+    LLM_TOKENS.labels(agent_name, "prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(agent_name, "completion").inc(completion_tokens)
+
+# Bump whenever the generator or evaluator prompts change, so analyses cached
+# under the old prompts are regenerated
+PROMPT_VERSION = "2"
 
 # --- Agent 1: Analytics Generator ---
 class AnalyticsGeneratorAgent(Agent):
@@ -30,30 +81,52 @@ class AnalyticsGeneratorAgent(Agent):
             backstory="You are an expert marketing analyst specializing in social media analytics. Your job is to turn raw Facebook metrics into clear, actionable insights."
         )
 
-    def generate_analytics(self, metrics: dict, feedback: str = None) -> dict:
+    def _prompt(self, metrics: dict, feedback: str = None) -> str:
         if feedback:
-            prompt = f"""You are a marketing analyst. Given the following Facebook metrics and evaluator feedback, generate improved, crisp, actionable insights.\n\nYou MUST return a valid JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\n\n\nMetrics: {json.dumps(metrics)}\n\nEvaluator Feedback: {feedback}\n\nRespond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
-        else:
-            prompt = f"""You are a marketing analyst. Given the following Facebook metrics, generate crisp, actionable insights.\n\nYou MUST return a valid JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\nMetrics: {json.dumps(metrics)}\n\nRespond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            temperature=0.7
-        )
-        content = response.choices[0].message.content.strip()
+            return f"""You are a marketing analyst. Given the following Facebook metrics and evaluator feedback, generate improved, crisp, actionable insights.\n\nYou MUST return a valid JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\n\n\nMetrics: {prompt_metrics(metrics)}\n\nEvaluator Feedback: {trim_feedback(feedback)}\n\nRespond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
+        return f"""You are a marketing analyst. Given the following Facebook metrics, generate crisp, actionable insights.\n\nYou MUST return a valid JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\nMetrics: {prompt_metrics(metrics)}\n\nRespond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
+
+    @staticmethod
+    def _parse(content: str) -> dict:
         try:
             insights = json.loads(content)
         except Exception:
             insights = {}
+        if not isinstance(insights, dict):
+            insights = {}
         # Ensure all required keys are present
         for key in REQUIRED_INSIGHT_KEYS:
             if key not in insights:
-                insights[key] = "AI did not generate this insight."
+                insights[key] = MISSING_INSIGHT
         # Remove any extra keys
         insights = {k: insights[k] for k in REQUIRED_INSIGHT_KEYS}
         return insights
 
+    def generate_analytics(self, metrics: dict, feedback: str = None) -> dict:
+        prompt = self._prompt(metrics, feedback)
+        require_api_key()
+        with span("llm_generate"):
+            response = openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=500,
+                temperature=0.7
+            )
+        report_usage("Generator", prompt, response)
+        return self._parse(response.choices[0].message.content.strip())
+
+    async def agenerate_analytics(self, metrics: dict, feedback: str = None) -> dict:
+        prompt = self._prompt(metrics, feedback)
+        with span("llm_generate"):
+            response = await async_client().chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=500,
+                temperature=0.7
+            )
+        report_usage("Generator", prompt, response)
+        return self._parse(response.choices[0].message.content.strip())
+
 # --- Agent 2: Analysis Evaluator ---
 class AnalysisEvaluatorAgent(Agent):
     def __init__(self):
@@ -64,21 +137,63 @@ class AnalysisEvaluatorAgent(Agent):
             backstory="You are a senior marketing strategist with a critical eye for insight quality. You ensure that all analytics are clear, actionable, and valuable."
         )
 
-    def evaluate(self, metrics: dict, analysis: dict) -> dict:
-        prompt = f"""You are a senior marketing strategist. Evaluate the following AI-generated Facebook analytics insights for quality, clarity, actionability, and professional English language. The insights must be in clear, standard English (not Pig Latin or any other code/language). If the analysis is not in clear English, or is otherwise insufficient, provide feedback.\n\nThe analysis MUST be a JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\nMetrics: {json.dumps(metrics)}\n\nAnalysis: {json.dumps(analysis)}\n\nIf the analysis is sufficient, in clear English, and all four keys are present, respond with {{"status": "pass", "final_analysis": analysis}}.\nIf not, provide feedback in the following JSON structure: {{"status": "feedback", "feedback": "..."}}. Do NOT revise the analysis yourself. Respond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
-        response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=600,
-            temperature=0.7
-        )
-        content = response.choices[0].message.content.strip()
+    def _prompt(self, metrics: dict, analysis: dict) -> str:
+        return f"""You are a senior marketing strategist. Evaluate the following AI-generated Facebook analytics insights for quality, clarity, actionability, and professional English language. The insights must be in clear, standard English (not Pig Latin or any other code/language). If the analysis is not in clear English, or is otherwise insufficient, provide feedback.\n\nThe analysis MUST be a JSON object with exactly these four keys: engagementRateInsight, reachInsight, breakdownInsight, summaryInsight.\n\nMetrics: {prompt_metrics(metrics)}\n\nAnalysis: {compact_json(analysis)}\n\nIf the analysis is sufficient, in clear English, and all four keys are present, respond with {{"status": "pass"}}.\nIf not, provide feedback in the following JSON structure: {{"status": "feedback", "feedback": "..."}}. Do NOT revise the analysis yourself. Respond ONLY with valid JSON using double quotes for all keys and string values. Do not use single quotes. Do not include any text before or after the JSON."""
+
+    @staticmethod
+    def _precheck(metrics: dict, analysis: dict):
+        """The local verdict, or None when the LLM evaluator has to judge the analysis."""
+        if EVALUATOR_MODE == "llm":
+            return None
+        with span("local_evaluate"):
+            feedback = check_analysis(metrics, analysis)
+        if feedback:
+            return {"status": "feedback", "feedback": feedback}
+        if EVALUATOR_MODE == "local":
+            return {"status": "pass"}
+        return None
+
+    @staticmethod
+    def _parse(content: str) -> dict:
         try:
             result = json.loads(content)
         except Exception:
             result = {"status": "error", "raw": content}
+        if not isinstance(result, dict):
+            result = {"status": "error", "raw": content}
         return result
 
+    def evaluate(self, metrics: dict, analysis: dict) -> dict:
+        verdict = self._precheck(metrics, analysis)
+        if verdict is not None:
+            return verdict
+        prompt = self._prompt(metrics, analysis)
+        require_api_key()
+        with span("llm_evaluate"):
+            response = openai.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=200,
+                temperature=0.7
+            )
+        report_usage("Analyzer", prompt, response)
+        return self._parse(response.choices[0].message.content.strip())
+
+    async def aevaluate(self, metrics: dict, analysis: dict) -> dict:
+        verdict = self._precheck(metrics, analysis)
+        if verdict is not None:
+            return verdict
+        prompt = self._prompt(metrics, analysis)
+        with span("llm_evaluate"):
+            response = await async_client().chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=200,
+                temperature=0.7
+            )
+        report_usage("Analyzer", prompt, response)
+        return self._parse(response.choices[0].message.content.strip())
+
 # --- CrewAI Orchestration Example ---
 def run_agentic_analysis(metrics: dict, max_loops: int = 3):
     generator = AnalyticsGeneratorAgent()
@@ -89,7 +204,7 @@ def run_agentic_analysis(metrics: dict, max_loops: int = 3):
         analysis = generator.generate_analytics(metrics, feedback)
         evaluation = evaluator.evaluate(metrics, analysis)
         if evaluation.get('status') == 'pass':
-            return evaluation['final_analysis'], None
+            return analysis, None
         elif evaluation.get('status') == 'feedback':
             feedback = evaluation.get('feedback')
         else:
@@ -98,6 +213,71 @@ def run_agentic_analysis(metrics: dict, max_loops: int = 3):
     # If max loops reached without pass
     return analysis, f"Max feedback loops reached. Last feedback: {feedback}"
 
+# --- Async pipeline with timeouts and a latency budget ---
+def failure_note(what, results):
+    """Why none of the concurrent calls in `results` produced a value, for the error evaluation.
+
+    A real failure (missing API key, HTTP or network error) is reported over
+    the timeouts of the other calls, since retrying won't fix it.
+    """
+    errors = [r for r in results if isinstance(r, BaseException)]
+    error = next((e for e in reversed(errors) if not isinstance(e, asyncio.TimeoutError)), None)
+    if error is None:
+        return f"{what} within the call timeout or latency budget."
+    return f"{what}: {type(error).__name__}: {error}"
+
+async def run_agentic_analysis_async(metrics: dict, max_loops: int = 3, candidates: int = None,
+                                     call_timeout: float = None, budget: float = None):
+    """Generate/evaluate loop bounded by per-call timeouts and an overall latency budget.
+
+    Each round generates `candidates` analyses concurrently and evaluates them in
+    parallel; the first one the evaluator passes wins. Returns (analysis, evaluation):
+    evaluation is None when an analysis passed, otherwise the last evaluation (or an
+    error naming the exception or timeout that stopped the calls). When time runs
+    out the last generated analysis is returned.
+    """
+    candidates = max(1, candidates or AGENT_CANDIDATES)
+    call_timeout = AGENT_CALL_TIMEOUT if call_timeout is None else call_timeout
+    budget = AGENT_LATENCY_BUDGET if budget is None else budget
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    generator = AnalyticsGeneratorAgent()
+    evaluator = AnalysisEvaluatorAgent()
+
+    async def bounded(coro):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            coro.close()
+            raise asyncio.TimeoutError
+        return await asyncio.wait_for(coro, timeout=min(call_timeout, remaining))
+
+    feedback = None
+    analysis = None
+    evaluation = None
+    for _ in range(max_loops):
+        results = await asyncio.gather(*(bounded(generator.agenerate_analytics(metrics, feedback))
+                                         for _ in range(candidates)), return_exceptions=True)
+        drafts = [r for r in results if not isinstance(r, BaseException)]
+        if not drafts:
+            evaluation = {"status": "error", "raw": failure_note("No analysis generated", results)}
+            break
+        analysis = drafts[-1]
+        evaluations = await asyncio.gather(*(bounded(evaluator.aevaluate(metrics, d)) for d in drafts),
+                                           return_exceptions=True)
+        for draft, result in zip(drafts, evaluations):
+            if isinstance(result, dict) and result.get('status') == 'pass':
+                return draft, None
+        reviewed = [(d, r) for d, r in zip(drafts, evaluations) if isinstance(r, dict)]
+        if not reviewed:
+            evaluation = {"status": "error", "raw": failure_note("Evaluation did not finish", evaluations)}
+            break
+        analysis, evaluation = next(((d, r) for d, r in reviewed if r.get('status') == 'feedback'), reviewed[-1])
+        if evaluation.get('status') != 'feedback':
+            # Error or unexpected response
+            break
+        feedback = evaluation.get('feedback')
+    return analysis, evaluation
+
 # --- Example Usage ---
 if __name__ == "__main__":
     # Example metrics (replace with real data as needed)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", os.path.join(BASE_DIR, "analysis_cache.db"))
+
+# Cached analyses expire after this many seconds, and only the most recently used
+# ANALYSIS_CACHE_MAX_ENTRIES are kept
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", str(24 * 3600)))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+
+
+def analysis_fingerprint(metrics, prompt_version):
+    """Stable hash of the metrics an analysis was generated from and the prompts used.
+
+    Pass only the metrics the prompts carry (prompt_builder.select_metrics), so
+    fields the agents never see don't invalidate cached analyses.
+    """
+    canonical = json.dumps(metrics, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{prompt_version}\n{canonical}".encode()).hexdigest()
+
+
+class AnalysisCache:
+    """Content-addressed SQLite cache of accepted AI analyses."""
+
+    def __init__(self, path=None, ttl=None, max_entries=None):
+        self.path = path or ANALYSIS_CACHE_PATH
+        self.ttl = ANALYSIS_CACHE_TTL if ttl is None else ttl
+        self.max_entries = ANALYSIS_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.hits = 0
+        self.misses = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    key TEXT PRIMARY KEY,
+                    analysis TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT analysis FROM analyses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE analyses SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, analysis):
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, analysis, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(analysis), now, now),
+            )
+            # Drop expired entries, then the least recently used beyond the size limit
+            conn.execute("DELETE FROM analyses WHERE created_at <= ?", (now - self.ttl,))
+            conn.execute(
+                "DELETE FROM analyses WHERE key NOT IN "
+                "(SELECT key FROM analyses ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
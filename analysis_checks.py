@@ -0,0 +1,118 @@
+import math
+import re
+
+# Keys every analysis must carry, one insight each
+REQUIRED_INSIGHT_KEYS = [
+    "engagementRateInsight",
+    "reachInsight",
+    "breakdownInsight",
+    "summaryInsight"
+]
+
+# Stand-in the generator parser writes for an insight the model did not return
+MISSING_INSIGHT = "AI did not generate this insight."
+
+# Insights shorter than this many words can't say anything actionable
+MIN_INSIGHT_WORDS = 5
+
+# Common English and social media words; real insights are rarely under
+# MIN_ENGLISH_SHARE of them, while Pig Latin or another language scores close to zero
+ENGLISH_WORDS = {
+    "a", "about", "after", "all", "also", "an", "and", "are", "as", "at", "be", "by", "can", "consider",
+    "could", "do", "each", "for", "from", "has", "have", "higher", "how", "if", "in", "increase", "into",
+    "is", "it", "its", "keep", "less", "lower", "more", "most", "not", "of", "on", "or", "our", "over",
+    "per", "should", "so", "than", "that", "the", "their", "these", "this", "to", "try", "up", "use",
+    "was", "were", "what", "when", "which", "while", "who", "will", "with", "you", "your",
+    "audience", "comment", "comments", "content", "engagement", "followers", "growth", "impressions",
+    "like", "likes", "month", "overall", "people", "post", "posting", "posts", "questions", "rate",
+    "rates", "reach", "share", "shares", "video", "videos", "views", "week",
+}
+MIN_ENGLISH_SHARE = 0.2
+
+# A figure like 12,345 / 4.5% / 12.3K, and the multiplier of each suffix
+_FIGURE = re.compile(r"(?<![\w.])(\d{1,3}(?:,\d{3})+|\d+)(?:\.(\d+))?\s*(%|[kKmM]\b)?")
+_SUFFIXES = {"k": 1e3, "m": 1e6}
+
+# A figure is a goal rather than a metric value only when its clause says so: goal
+# phrasing ("aim to keep it above 10%", "a target of 1,500 likes", "at least 20%")
+# or a verb used as an instruction ("grow comments by 20%", "ask questions to
+# boost shares by 15%"). "Reach climbed to 50,000" is still checked.
+GOAL_PHRASES = re.compile(
+    r"\b(?:aim|aims|aiming|target|targets|targeting|goal|goals|at least|at most|no less than)\b")
+GOAL_VERBS = (
+    "keep", "grow", "increase", "boost", "lift", "raise", "push", "double", "triple", "hit",
+    "drive", "reduce", "cut", "improve", "bring", "get",
+)
+_INSTRUCTION = re.compile(
+    rf"(?:^|\b(?:to|should|could|can|must|please)\s+)(?:{'|'.join(GOAL_VERBS)})\b")
+# Clauses end at sentence punctuation, a comma or a joining "and"/"but"/"then"
+_CLAUSE_END = re.compile(r"[.;:!?](?=\s|$)|,\s|\s(?:and|but|then)\s")
+# "a 15% target", "a 20% goal"
+GOAL_WORDS_AFTER = {"target", "targets", "goal", "goals"}
+
+
+def _is_goal(text, match):
+    clause = _CLAUSE_END.split(text[:match.start()].lower())[-1]
+    clause = re.sub(r"^[^a-z]+", "", clause)
+    after = re.match(r"\W*([a-z]+)", text[match.end():].lower())
+    return bool(GOAL_PHRASES.search(clause) or _INSTRUCTION.search(clause)
+                or (after and after.group(1) in GOAL_WORDS_AFTER))
+
+
+def quoted_figures(text):
+    """Figures in an insight worth checking against the metrics: (written, value, tolerance).
+
+    Counts from 100 up, decimals and percentages; small whole numbers ("3 posts a
+    week") are advice rather than citations, and so are goals (see GOAL_PHRASES).
+    The tolerance is half a unit of the last digit written, so rounded figures
+    still match.
+    """
+    figures = []
+    for match in _FIGURE.finditer(text):
+        if _is_goal(text, match):
+            continue
+        whole, decimals, suffix = match.groups()
+        value = float(whole.replace(",", "") + (f".{decimals}" if decimals else ""))
+        if not decimals and not suffix and value < 100:
+            continue
+        scale = _SUFFIXES.get((suffix or "").lower(), 1)
+        tolerance = 0.5 * 10 ** -len(decimals or "") * scale
+        figures.append((match.group(0).strip(), value * scale, tolerance))
+    return figures
+
+
+def _matches(value, tolerance, numbers):
+    return any(abs(value - number) <= max(tolerance, abs(number) * 0.005) for number in numbers)
+
+
+def check_analysis(metrics, analysis):
+    """Deterministic checks of a generated analysis; feedback text for the generator, or None.
+
+    Verifies that every required insight is there (a missing or unparseable
+    answer leaves MISSING_INSIGHT), that each reads as English prose and that
+    the figures it quotes are values of `metrics` (rounding allowed).
+    """
+    if not isinstance(analysis, dict):
+        return "The analysis must be a JSON object with the four insight keys."
+    problems = []
+    missing = [key for key in REQUIRED_INSIGHT_KEYS
+               if not isinstance(analysis.get(key), str) or analysis[key].strip() in ("", MISSING_INSIGHT)]
+    if missing:
+        problems.append(f"Missing or empty insights: {', '.join(missing)}. Return valid JSON with all four keys.")
+    numbers = [float(value) for value in metrics.values()
+               if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)]
+    for key in REQUIRED_INSIGHT_KEYS:
+        if key in missing:
+            continue
+        text = analysis[key]
+        words = re.findall(r"[A-Za-z']+", text.lower())
+        if len(words) < MIN_INSIGHT_WORDS:
+            problems.append(f"{key} is too short to be actionable.")
+        elif sum(word in ENGLISH_WORDS for word in words) / len(words) < MIN_ENGLISH_SHARE:
+            problems.append(f"{key} is not written in clear, standard English.")
+        wrong = [written for written, value, tolerance in quoted_figures(text)
+                 if not _matches(value, tolerance, numbers)]
+        if wrong:
+            problems.append(f"{key} quotes figures that are not in the metrics: {', '.join(wrong)}. "
+                            f"Only cite the metric values provided.")
+    return " ".join(problems) or None
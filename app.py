@@ -1,14 +1,33 @@
-import requests
+import asyncio
+import importlib
 import json
 import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional
 from dotenv import load_dotenv
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from agent import AnalyticsGeneratorAgent, AnalysisEvaluatorAgent
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from analysis_cache import AnalysisCache, analysis_fingerprint
+from broadcaster import RESYNC, SSE_KEEPALIVE, Broadcaster, diff_event, sse_event
+from cached_response import CachedBody
+from derived_metrics import add_derived_metrics
+from facebook_metrics import fetch_facebook_organic_metrics
+from graph import GraphClient, GraphError, graph_stats
+from instagram_metrics import fetch_instagram_metrics
+from history_store import AGGREGATES, DAY, MetricHistoryStore, default_resolution, series_json
+from post_store import PostMetricStore
+from post_table import KINDS, SORT_COLUMNS, PostTable
+from prompt_builder import select_metrics
+from snapshot_store import read_snapshot, write_snapshot
+from static_assets import StaticAssets
+from telemetry import HTTPMetricsMiddleware, exposition, span
 
 # Load environment variables from .env file
 load_dotenv()
@@ -27,327 +46,379 @@ if not access_token or not page_id:
     except FileNotFoundError:
         print("Warning: Facebook credentials not found in .env or facebook_settings.json")
 
-# Page ID and URL to get post IDs
-url = f"https://graph.facebook.com/v18.0/{page_id}/posts?fields=id&limit=10&access_token={access_token}"
-
-# Get posts
-response = requests.get(url)
-posts = response.json().get("data", [])
-
-# Initialize metrics
-reach = 0
-impressions = 0
-organic_impressions = 0
-paid_impressions = 0
-likes = 0
-comments = 0
-shares = 0
-reactions = 0
-
-# Loop through each post and fetch metrics
-for post in posts:
-    post_id = post['id']
-    # Basic engagement (likes, comments, shares, reactions, page name)
-    fields = "from{name},likes.summary(true),comments.summary(true),shares,reactions.summary(true)"
-    engagement_url = f"https://graph.facebook.com/v18.0/{post_id}?fields={fields}&access_token={access_token}"
-    engagement = requests.get(engagement_url).json()
-
-    # Insights (reach, impressions, organic, paid)
-    metrics = "post_impressions,post_impressions_unique,post_impressions_organic,post_impressions_paid"
-    insights_url = f"https://graph.facebook.com/v18.0/{post_id}/insights?metric={metrics}&access_token={access_token}"
-    insights = requests.get(insights_url).json()
-
-    # Extract values
-    post_reach = 0
-    post_impressions = 0
-    post_organic_impressions = 0
-    post_paid_impressions = 0
-    for item in insights.get("data", []):
-        if item["name"] == "post_impressions_unique":
-            post_reach = item["values"][0]["value"]
-        elif item["name"] == "post_impressions":
-            post_impressions = item["values"][0]["value"]
-        elif item["name"] == "post_impressions_organic":
-            post_organic_impressions = item["values"][0]["value"]
-        elif item["name"] == "post_impressions_paid":
-            post_paid_impressions = item["values"][0]["value"]
-    reach += post_reach
-    impressions += post_impressions
-    organic_impressions += post_organic_impressions
-    paid_impressions += post_paid_impressions
-    likes += engagement.get("likes", {}).get("summary", {}).get("total_count", 0)
-    comments += engagement.get("comments", {}).get("summary", {}).get("total_count", 0)
-    shares += engagement.get("shares", {}).get("count", 0)
-    reactions += engagement.get("reactions", {}).get("summary", {}).get("total_count", 0)
-
-# Calculate Engagement Rate
-engagement_total = likes + comments + shares + reactions
-engagement_rate = (engagement_total / reach * 100) if reach > 0 else 0
-
-# --- Fetch all organic metrics for the dashboard ---
-def fetch_facebook_organic_metrics(page_id, access_token):
-    # Organic metrics to fetch (from config modal)
-    metrics = {
-        'reach': 0,
-        'impressions': 0,
-        'organicImpressions': 0,
-        'paidImpressions': 0,
-        'likes': 0,
-        'comments': 0,
-        'shares': 0,
-        'videoViews': 0,
-        'tenSecondViews': 0,
-        'averageWatchTime': 0,
-        'videoRetentionRate': 0,
-        'websiteClicks': 0,
-        'ctaClicks': 0,
-        'postSaves': 0,
-        'adSpend': 0,
-        'adRelevanceScore': 0,
-    }
-    # Fetch posts for engagement and impressions
-    posts_url = f"https://graph.facebook.com/v18.0/{page_id}/posts?fields=id&limit=10&access_token={access_token}"
-    posts = requests.get(posts_url).json().get("data", [])
-    for post in posts:
-        post_id = post['id']
-        # Engagement
-        fields = "likes.summary(true),comments.summary(true),shares"
-        engagement_url = f"https://graph.facebook.com/v18.0/{post_id}?fields={fields}&access_token={access_token}"
-        engagement = requests.get(engagement_url).json()
-        metrics['likes'] += engagement.get("likes", {}).get("summary", {}).get("total_count", 0)
-        metrics['comments'] += engagement.get("comments", {}).get("summary", {}).get("total_count", 0)
-        metrics['shares'] += engagement.get("shares", {}).get("count", 0)
-        # Impressions/Reach
-        insights = "post_impressions,post_impressions_unique,post_impressions_organic,post_impressions_paid"
-        insights_url = f"https://graph.facebook.com/v18.0/{post_id}/insights?metric={insights}&access_token={access_token}"
-        insights_data = requests.get(insights_url).json()
-        for item in insights_data.get("data", []):
-            if item["name"] == "post_impressions_unique":
-                metrics['reach'] += item["values"][0]["value"]
-            elif item["name"] == "post_impressions":
-                metrics['impressions'] += item["values"][0]["value"]
-            elif item["name"] == "post_impressions_organic":
-                metrics['organicImpressions'] += item["values"][0]["value"]
-            elif item["name"] == "post_impressions_paid":
-                metrics['paidImpressions'] += item["values"][0]["value"]
-    # Fetch video metrics (example: first 5 videos)
-    videos_url = f"https://graph.facebook.com/v18.0/{page_id}/videos?fields=id&limit=5&access_token={access_token}"
-    videos = requests.get(videos_url).json().get("data", [])
-    for video in videos:
-        video_id = video['id']
-        video_fields = "video_insights.metric(total_video_impressions,total_video_views,total_video_10s_views,average_watch_time,video_retention)"
-        video_insights_url = f"https://graph.facebook.com/v18.0/{video_id}/insights?metric=total_video_views,total_video_10s_views,average_watch_time,video_retention&access_token={access_token}"
-        video_insights = requests.get(video_insights_url).json()
-        for item in video_insights.get("data", []):
-            if item["name"] == "total_video_views":
-                metrics['videoViews'] += item["values"][0]["value"]
-            elif item["name"] == "total_video_10s_views":
-                metrics['tenSecondViews'] += item["values"][0]["value"]
-            elif item["name"] == "average_watch_time":
-                metrics['averageWatchTime'] += item["values"][0]["value"]
-            elif item["name"] == "video_retention":
-                metrics['videoRetentionRate'] += item["values"][0]["value"]
-    # Fetch page-level metrics (website clicks, cta clicks, post saves, ad spend, ad relevance score)
-    # These may require different endpoints or permissions; placeholders below:
-    # metrics['websiteClicks'] = ...
-    # metrics['ctaClicks'] = ...
-    # metrics['postSaves'] = ...
-    # metrics['adSpend'] = ...
-    # metrics['adRelevanceScore'] = ...
-    return metrics
+# Page served by /papi/facebook-metrics when no page_id is given
+DEFAULT_PAGE_ID = str(page_id) if page_id else None
 
-# Replace the old metrics calculation with the new function
-metrics = fetch_facebook_organic_metrics(page_id, access_token)
-
-# Calculate engagementTotal and engagementRate for AI and frontend
-metrics['engagementTotal'] = metrics['likes'] + metrics['comments'] + metrics['shares']
-metrics['engagementRate'] = round((metrics['engagementTotal'] / metrics['reach'] * 100) if metrics['reach'] > 0 else 0, 2)
-
-# --- Calculate derived metrics ---
-# Frequency: Impressions ÷ Reach
-metrics['frequency'] = round((metrics['impressions'] / metrics['reach']) if metrics['reach'] > 0 else 0, 2)
-
-# Reach Rate: Reach ÷ Total Followers × 100
-# You need to fetch total followers from the Graph API
-followers_url = f"https://graph.facebook.com/v18.0/{page_id}?fields=followers_count&access_token={access_token}"
-followers_data = requests.get(followers_url).json()
-total_followers = followers_data.get('followers_count', 0)
-metrics['reachRate'] = round((metrics['reach'] / total_followers * 100) if total_followers > 0 else 0, 2)
-metrics['totalFollowers'] = total_followers  # Optionally include for frontend
-
-# Impression Share: Your Impressions ÷ Total Available Impressions × 100
-# You need to define or fetch total available impressions (placeholder below)
-total_available_impressions = metrics['impressions']  # TODO: Replace with real value if available
-metrics['impressionShare'] = round((metrics['impressions'] / total_available_impressions * 100) if total_available_impressions > 0 else 0, 2)
-metrics['totalAvailableImpressions'] = total_available_impressions  # Optionally include for frontend
-
-# Click-Through Rate: Total Clicks ÷ Impressions × 100
-# (Assume websiteClicks as Total Clicks; update if you have a more precise metric)
-metrics['clickThroughRate'] = round((metrics['websiteClicks'] / metrics['impressions'] * 100) if metrics['impressions'] > 0 else 0, 2)
-
-# Comment Rate: Comments ÷ Reach × 100
-metrics['commentRate'] = round((metrics['comments'] / metrics['reach'] * 100) if metrics['reach'] > 0 else 0, 2)
-
-# Share Rate: Shares ÷ Reach × 100
-metrics['shareRate'] = round((metrics['shares'] / metrics['reach'] * 100) if metrics['reach'] > 0 else 0, 2)
-
-# Amplification Rate: Shares ÷ Total Engagements × 100
-metrics['amplificationRate'] = round((metrics['shares'] / metrics['engagementTotal'] * 100) if metrics['engagementTotal'] > 0 else 0, 2)
-
-# Applause Rate: Likes ÷ Total Engagements × 100
-metrics['applauseRate'] = round((metrics['likes'] / metrics['engagementTotal'] * 100) if metrics['engagementTotal'] > 0 else 0, 2)
-
-# Conversation Rate: Comments ÷ Total Engagements × 100
-metrics['conversationRate'] = round((metrics['comments'] / metrics['engagementTotal'] * 100) if metrics['engagementTotal'] > 0 else 0, 2)
-
-# Engagement Rate by Impressions: Total Engagements ÷ Impressions × 100
-metrics['engagementByImpressions'] = round((metrics['engagementTotal'] / metrics['impressions'] * 100) if metrics['impressions'] > 0 else 0, 2)
-
-# Conversion Rate: Conversions ÷ Link Clicks × 100
-# (Assume ctaClicks as Link Clicks and postSaves as Conversions for placeholder; update as needed)
-metrics['conversionRate'] = round((metrics['postSaves'] / metrics['ctaClicks'] * 100) if metrics['ctaClicks'] > 0 else 0, 2)
-
-# Cost Per Click (CPC): Ad Spend ÷ Total Clicks
-metrics['costPerClick'] = round((metrics['adSpend'] / metrics['websiteClicks']) if metrics['websiteClicks'] > 0 else 0, 2)
-
-# Cost Per Thousand Impressions (CPM): Ad Spend ÷ Impressions × 1000
-metrics['costPerMille'] = round((metrics['adSpend'] / metrics['impressions'] * 1000) if metrics['impressions'] > 0 else 0, 2)
-
-# Save Rate: Post Saves ÷ Reach × 100
-metrics['saveRate'] = round((metrics['postSaves'] / metrics['reach'] * 100) if metrics['reach'] > 0 else 0, 2)
-
-# Return on Ad Spend (ROAS): Revenue ÷ Ad Spend × 100
-# Placeholder: revenue = 0 (update with real value if available)
-revenue = 0
-metrics['returnOnAdSpend'] = round((revenue / metrics['adSpend'] * 100) if metrics['adSpend'] > 0 else 0, 2)
-
-# Revenue Per Click: Total Revenue ÷ Total Clicks
-metrics['revenuePerClick'] = round((revenue / metrics['websiteClicks']) if metrics['websiteClicks'] > 0 else 0, 2)
-
-# Customer Acquisition Cost (CAC): Ad Spend ÷ New Customers
-# Placeholder: new_customers = 0 (update with real value if available)
-new_customers = 0
-metrics['customerAcquisitionCost'] = round((metrics['adSpend'] / new_customers) if new_customers > 0 else 0, 2)
-
-# Cost Per Acquisition (CPA): Ad Spend ÷ Conversions
-# (Assume postSaves as Conversions for placeholder; update as needed)
-metrics['costPerAcquisition'] = round((metrics['adSpend'] / metrics['postSaves']) if metrics['postSaves'] > 0 else 0, 2)
-
-# Bid Efficiency: Actual CPC ÷ Max Bid × 100
-# Placeholder: actual_cpc = costPerClick, max_bid = 1 (update as needed)
-actual_cpc = metrics['costPerClick']
-max_bid = 1  # TODO: Replace with real max bid if available
-metrics['bidEfficiency'] = round((actual_cpc / max_bid * 100) if max_bid > 0 else 0, 2)
-
-# Audience Saturation: Reach ÷ Audience Size × 100
-# Use total_followers as audience size for a Facebook page
-metrics['audienceSaturation'] = round((metrics['reach'] / total_followers * 100) if total_followers > 0 else 0, 2)
-
-# Daily Budget Utilization: Daily Spend ÷ Daily Budget × 100
-# Placeholder: daily_spend = adSpend, daily_budget = 1 (update as needed)
-daily_spend = metrics['adSpend']
-daily_budget = 1  # TODO: Replace with real daily budget if available
-metrics['dailyBudgetUtilization'] = round((daily_spend / daily_budget * 100) if daily_budget > 0 else 0, 2)
-
-# Optimization Score: (Quality Ranking + Engagement Ranking + Conversion Ranking) ÷ 3
-# Placeholder: quality_ranking = 0, engagement_ranking = 0, conversion_ranking = 0 (update as needed)
-quality_ranking = 0
-engagement_ranking = 0
-conversion_ranking = 0
-metrics['optimizationScore'] = round(((quality_ranking + engagement_ranking + conversion_ranking) / 3) if 3 > 0 else 0, 2)
-
-# Learning Efficiency: Conversions During Learning ÷ Total Conversions × 100
-# Placeholder: conversions_during_learning = 0 (update as needed)
-conversions_during_learning = 0
-metrics['learningEfficiency'] = round((conversions_during_learning / metrics['postSaves'] * 100) if metrics['postSaves'] > 0 else 0, 2)
-
-# Incremental ROAS: (Campaign Revenue - Baseline Revenue) ÷ Ad Spend
-# Placeholder: campaign_revenue = 0, baseline_revenue = 0 (update as needed)
-campaign_revenue = 0
-baseline_revenue = 0
-metrics['incrementalROAS'] = round(((campaign_revenue - baseline_revenue) / metrics['adSpend']) if metrics['adSpend'] > 0 else 0, 2)
-
-# Video Completion Rate: Completed Views ÷ Total Video Views × 100
-# (Assume tenSecondViews as Completed Views and videoViews as Total Video Views for placeholder)
-metrics['videoCompletionRate'] = round((metrics['tenSecondViews'] / metrics['videoViews'] * 100) if metrics['videoViews'] > 0 else 0, 2)
-
-# Video Engagement Rate: Video Engagements ÷ Video Views × 100
-# Placeholder: video_engagements = likes + comments + shares (for video posts only, if available)
-video_engagements = metrics['likes'] + metrics['comments'] + metrics['shares']  # TODO: Replace with video-specific engagements if available
-metrics['videoEngagementRate'] = round((video_engagements / metrics['videoViews'] * 100) if metrics['videoViews'] > 0 else 0, 2)
-
-# Video CTR: Video Clicks ÷ Video Impressions × 100
-# Placeholder: video_clicks = websiteClicks, video_impressions = impressions (update if you have video-specific data)
-metrics['videoCTR'] = round((metrics['websiteClicks'] / metrics['impressions'] * 100) if metrics['impressions'] > 0 else 0, 2)
+# Instagram Business account collected with the default page; other pages (and the
+# default one when this is unset) use the account linked to them, if any
+INSTAGRAM_ACCOUNT_ID = os.getenv("INSTAGRAM_ACCOUNT_ID")
 
-# Average Percentage Viewed: Average Watch Time ÷ Video Duration × 100
-# Placeholder: video_duration = 1 (update with real average video duration if available)
-video_duration = 1  # TODO: Replace with real average video duration if available
-metrics['averagePercentageViewed'] = round((metrics['averageWatchTime'] / video_duration * 100) if video_duration > 0 else 0, 2)
+# Seconds between background metric refreshes, plus up to METRICS_REFRESH_JITTER
+# random seconds so several processes don't hit the Graph API in lockstep
+METRICS_REFRESH_INTERVAL = float(os.getenv("METRICS_REFRESH_INTERVAL", "900"))
+METRICS_REFRESH_JITTER = float(os.getenv("METRICS_REFRESH_JITTER", "60"))
 
-# --- AI Agentic Analysis Integration ---
-import sys
-try:
-    print("[DEBUG] Running Generator agent...", file=sys.stderr)
-    generator = AnalyticsGeneratorAgent()
-    evaluator = AnalysisEvaluatorAgent()
-    ai_analysis, ai_feedback = None, None
-    max_loops = 3
-    feedback = None
-    for loop in range(max_loops):
-        ai_analysis = generator.generate_analytics(metrics, feedback)
-        print(f"[DEBUG] Generator agent completed (loop {loop+1}).", file=sys.stderr)
-        print("[DEBUG] Running Analyzer agent...", file=sys.stderr)
-        evaluation = evaluator.evaluate(metrics, ai_analysis)
-        print(f"[DEBUG] Analyzer findings: {evaluation if evaluation else 'Analysis passed.'}", file=sys.stderr)
-        if evaluation.get('status') == 'pass':
-            for k, v in ai_analysis.items():
-                metrics[k] = v
-            print("[DEBUG] Agentic analysis successful. Insights written to JSON.", file=sys.stderr)
-            ai_feedback = None
-            break
-        elif evaluation.get('status') == 'feedback':
-            feedback = evaluation.get('feedback')
-            ai_feedback = evaluation
-            print("[DEBUG] Analyzer requested revision. Retrying...", file=sys.stderr)
-            continue
-        else:
-            print("[DEBUG] Unexpected analyzer response. Writing last result.", file=sys.stderr)
-            for k, v in ai_analysis.items():
-                metrics[k] = v
-            ai_feedback = evaluation
-            break
-    else:
-        print("[DEBUG] Max feedback loops reached. Writing last result.", file=sys.stderr)
+# Number of pages whose Graph crawl may run at the same time
+METRICS_REFRESH_WORKERS = int(os.getenv("METRICS_REFRESH_WORKERS", "4"))
+
+# Threads for the short steps after a crawl (post table, serialization, file and
+# history writes), kept apart so a finished page never waits behind other crawls
+METRICS_PUBLISH_WORKERS = int(os.getenv("METRICS_PUBLISH_WORKERS", "2"))
+
+# Who collects the metrics: "inline" refreshes them in this process; "external"
+# leaves that to collector.py and only reloads the snapshot files it writes
+METRICS_COLLECTOR = os.getenv("METRICS_COLLECTOR", "inline")
+
+# Seconds between checks for new snapshot files when METRICS_COLLECTOR=external
+SNAPSHOT_POLL_INTERVAL = float(os.getenv("SNAPSHOT_POLL_INTERVAL", "2"))
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_FILE = os.path.join(BASE_DIR, 'fb_metrics.json')
+
+# Per-post metrics persisted between refreshes so settled posts aren't refetched
+post_store = PostMetricStore()
+
+# Accepted AI analyses keyed by metrics fingerprint, so unchanged metrics skip the LLM
+analysis_cache = AnalysisCache()
+
+# Every refreshed snapshot, kept as a time series for trend queries
+history_store = MetricHistoryStore()
+
+# Pages served by this process: page_id -> page access token
+pages = {}
+
+# Last good snapshot per page: page_id -> (metrics, pre-serialized body)
+snapshots = {}
+
+# Per-post breakdown of each page's last snapshot: page_id -> PostTable
+post_tables = {}
+
+# Version of the snapshot files each page was last loaded from: page_id -> {kind: version}
+snapshot_versions = {}
+
+# Pushes snapshot changes to every dashboard connected to the event stream
+broadcaster = Broadcaster()
+
+# Dashboard shell and demo data, precompressed and served from memory
+static_assets = StaticAssets(os.path.join(BASE_DIR, "static"))
+DASHBOARD = "FB-Analytics-Dashboard.html"
+DEMO_DATA = "dummydata.json"
+
+# Graph crawls (background refreshes and on-demand ranges) and the steps publishing their results
+_refresh_executor = ThreadPoolExecutor(max_workers=METRICS_REFRESH_WORKERS, thread_name_prefix="refresh")
+_publish_executor = ThreadPoolExecutor(max_workers=METRICS_PUBLISH_WORKERS, thread_name_prefix="publish")
+
+
+def default_pages():
+    # The page of .env / facebook_settings.json, if configured
+    return {str(page_id): access_token} if access_token and page_id else {}
+
+
+def load_pages():
+    """The default page plus every page in the facebook_settings table.
+
+    Raises when the table can't be read, so callers can tell an outage from
+    pages that were removed.
+    """
+    found = default_pages()
+    if os.getenv("DB_HOST"):
+        from db import fetch_all_facebook_settings
+        found.update(fetch_all_facebook_settings())
+    return found
+
+
+async def reload_pages():
+    """load_pages() off the event loop; while the table can't be read, the pages already served are kept."""
+    try:
+        return await asyncio.to_thread(load_pages)
+    except Exception as e:
+        print(f"[DEBUG] Could not load pages from facebook_settings: {str(e)}", file=sys.stderr)
+        return {**default_pages(), **pages}
+
+
+def metrics_file(page):
+    # The default page keeps the historical file name
+    if page == DEFAULT_PAGE_ID:
+        return METRICS_FILE
+    return os.path.join(BASE_DIR, f'fb_metrics_{page}.json')
+
+
+def posts_file(page):
+    # Per-post rows of the snapshot, next to the metrics file
+    return os.path.splitext(metrics_file(page))[0] + '_posts.json'
+
+
+# Refreshes started for pages first requested on demand (kept so they aren't garbage-collected mid-run)
+_page_refreshes = set()
+
+_agent = None
+
+
+async def load_agent():
+    """Import the agent stack (crewai, openai) on first use.
+
+    It takes seconds to load, so it stays off the serving path: the import runs
+    in a worker thread instead of blocking the event loop.
+    """
+    global _agent
+    if _agent is None:
+        _agent = await asyncio.to_thread(importlib.import_module, "agent")
+    return _agent
+
+
+async def add_ai_analysis(metrics):
+    # --- AI Agentic Analysis Integration ---
+    try:
+        agent = await load_agent()
+        # Keyed by exactly what the prompts carry, so changes the agents never see keep the cache
+        cache_key = analysis_fingerprint(select_metrics(metrics), agent.PROMPT_VERSION)
+        # SQLite lookups block, so they stay off the event loop
+        cached = await asyncio.to_thread(analysis_cache.get, cache_key)
+        if cached is not None:
+            metrics.update(cached)
+            print("[DEBUG] Metrics unchanged since a previous analysis. Reusing cached insights.", file=sys.stderr)
+            return
+        print("[DEBUG] Running Generator and Analyzer agents...", file=sys.stderr)
+        ai_analysis, evaluation = await agent.run_agentic_analysis_async(metrics)
+        if ai_analysis is None:
+            raise RuntimeError(evaluation.get('raw'))
         for k, v in ai_analysis.items():
             metrics[k] = v
-    if ai_feedback and isinstance(ai_feedback, dict) and ai_feedback.get('status') == 'feedback':
-        metrics['ai_analysis_feedback'] = ai_feedback
-except Exception as e:
-    for k in ["engagementRateInsight", "reachInsight", "breakdownInsight", "summaryInsight"]:
-        metrics[k] = f"AI agentic analysis failed: {str(e)}"
-    print(f"[DEBUG] Agentic analysis failed: {str(e)}", file=sys.stderr)
+        if evaluation is None:
+            await asyncio.to_thread(analysis_cache.put, cache_key, ai_analysis)
+            print("[DEBUG] Agentic analysis successful. Insights written to JSON.", file=sys.stderr)
+        else:
+            print(f"[DEBUG] Analyzer findings: {evaluation}. Writing last result.", file=sys.stderr)
+            if evaluation.get('status') == 'feedback':
+                metrics['ai_analysis_feedback'] = evaluation
+    except Exception as e:
+        for k in ["engagementRateInsight", "reachInsight", "breakdownInsight", "summaryInsight"]:
+            metrics[k] = f"AI agentic analysis failed: {str(e)}"
+        print(f"[DEBUG] Agentic analysis failed: {str(e)}", file=sys.stderr)
+
+    # Remove test key if present
+    metrics.pop('hi', None)
+
+
+def page_profile(client, page):
+    """Followers of the page and the ID of its linked Instagram Business account (or None)."""
+    with span("followers"):
+        try:
+            profile = client.get(page, fields="followers_count,instagram_business_account")
+        except GraphError:
+            # Tokens without Instagram permissions can't read the linked account
+            profile = client.get(page, fields="followers_count")
+    account = profile.get('instagram_business_account', {}).get('id')
+    if page == DEFAULT_PAGE_ID and INSTAGRAM_ACCOUNT_ID:
+        account = INSTAGRAM_ACCOUNT_ID
+    return profile.get('followers_count', 0), account
+
+
+def collect_instagram(client, account, token, since, until, page_size, posts):
+    metrics = fetch_instagram_metrics(account, token, client=client, since=since, until=until,
+                                      page_size=page_size, posts=posts)
+    with span("followers"):
+        followers = client.get(account, fields="followers_count").get('followers_count', 0)
+    with span("derived_metrics"):
+        add_derived_metrics(metrics, followers)
+    metrics['instagramAccountId'] = account
+    return metrics
 
-# Remove test key if present
-metrics.pop('hi', None)
 
-with open('fb_metrics.json', 'w') as f:
-    json.dump(metrics, f, indent=2)
+def collect_metrics(page, token, since=None, until=None, page_size=None, posts=None, store=None):
+    """Crawl one page's metrics; with a PostMetricStore as `store`, settled posts are read from it."""
+    with GraphClient(token) as client:
+        total_followers, account = page_profile(client, page)
+        # Instagram is crawled alongside Facebook, sharing the client's connection pool
+        with ThreadPoolExecutor(max_workers=1) as side:
+            instagram = account and side.submit(
+                collect_instagram, client, account, token, since, until, page_size, posts)
+            metrics = fetch_facebook_organic_metrics(page, token, client=client, store=store,
+                                                     since=since, until=until, page_size=page_size, posts=posts)
+            if instagram:
+                try:
+                    metrics['instagram'] = instagram.result()
+                except GraphError as e:
+                    # Keep the Facebook snapshot when only the Instagram side failed
+                    print(f"[DEBUG] Instagram metrics for page {page} failed: {str(e)}", file=sys.stderr)
+    with span("derived_metrics"):
+        add_derived_metrics(metrics, total_followers)
+    return metrics
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+def snapshot_event(body):
+    return sse_event("snapshot", body.variants["identity"][0], body.etag)
 
-app = FastAPI()
+
+def publish_metrics(page, metrics, body=None):
+    # Build the body first so readers never see a dict without its matching body
+    previous = snapshots.get(page)
+    body = body or CachedBody.from_json(metrics)
+    snapshots[page] = (metrics, body)
+    # Connected dashboards get only the keys that changed
+    if previous is None:
+        broadcaster.publish(page, snapshot_event(body))
+    else:
+        event = diff_event(previous[0], metrics, body.etag)
+        if event is not None:
+            broadcaster.publish(page, event)
+
+
+def write_page_snapshot(page, body, posts):
+    """Atomically replace the page's snapshot files; the metrics file holds exactly the served body."""
+    write_snapshot(posts_file(page), json.dumps(posts, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    write_snapshot(metrics_file(page), body.variants["identity"][0])
+
+
+def read_page_snapshot(page):
+    """Load the page's snapshot files that changed since they were last read.
+
+    Returns (metrics, body, table), with None for each part whose file is
+    missing or unchanged. The metrics file is served as is, without re-encoding.
+    """
+    versions = snapshot_versions.setdefault(page, {})
+    metrics = body = table = None
+    found = read_snapshot(posts_file(page), versions.get("posts"))
+    if found is not None:
+        data, _, versions["posts"] = found
+        table = PostTable(json.loads(data))
+    found = read_snapshot(metrics_file(page), versions.get("metrics"))
+    if found is not None:
+        data, mtime, versions["metrics"] = found
+        metrics, body = json.loads(data), CachedBody(data, last_modified=mtime)
+    return metrics, body, table
+
+
+def apply_page_snapshot(page, metrics, body, table):
+    if table is not None:
+        post_tables[page] = table
+    if metrics is not None:
+        publish_metrics(page, metrics, body)
+
+
+async def refresh_metrics(page):
+    """Collect a fresh snapshot of one page; on failure its previous snapshot keeps being served."""
+    token = pages[page]
+    loop = asyncio.get_running_loop()
+    started = time.monotonic()
+    try:
+        # Graph crawling blocks, so it runs on the refresh worker pool and the short
+        # publishing steps on their own; the LLM pipeline is async and runs on the event loop
+        with span("refresh"):
+            posts = []
+            metrics = await loop.run_in_executor(
+                _refresh_executor, lambda: collect_metrics(page, token, posts=posts, store=post_store))
+            with span("post_table"):
+                table = await loop.run_in_executor(_publish_executor, PostTable, posts)
+            with span("ai_analysis"):
+                await add_ai_analysis(metrics)
+            body = await loop.run_in_executor(_publish_executor, CachedBody.from_json, metrics)
+            with span("json_write"):
+                await loop.run_in_executor(_publish_executor, write_page_snapshot, page, body, posts)
+            with span("history_append"):
+                await loop.run_in_executor(_publish_executor, history_store.append, page, metrics)
+            publish_metrics(page, metrics, body)
+            post_tables[page] = table
+        print(f"[DEBUG] Metrics for page {page} refreshed in {time.monotonic() - started:.1f}s.", file=sys.stderr)
+    except Exception as e:
+        print(f"[DEBUG] Metrics refresh for page {page} failed: {str(e)}", file=sys.stderr)
+
+
+def load_metrics_snapshot(page):
+    try:
+        metrics, body, table = read_page_snapshot(page)
+    except ValueError:
+        metrics = body = table = None
+    if table is None and page not in post_tables:
+        # Posts stored by earlier runs (without text and links until the next refresh)
+        stored = post_store.rows(page)
+        if stored:
+            table = PostTable({**row, 'id': object_id} for object_id, row in stored.items())
+    apply_page_snapshot(page, metrics, body, table)
+
+
+async def refresh_page_periodically(page):
+    # Pages that already have a snapshot start at random offsets within the jitter
+    # window so they don't all crawl at once
+    if page in snapshots:
+        await asyncio.sleep(random.uniform(0, METRICS_REFRESH_JITTER))
+    while True:
+        await refresh_metrics(page)
+        await asyncio.sleep(METRICS_REFRESH_INTERVAL + random.uniform(0, METRICS_REFRESH_JITTER))
+
+
+async def schedule_pages():
+    """Keep one refresh loop per configured page, picking up added and removed pages."""
+    refreshers = {}
+    try:
+        while True:
+            found = await reload_pages()
+            for page in list(refreshers):
+                if page not in found:
+                    refreshers.pop(page).cancel()
+                    for state in (snapshots, post_tables, snapshot_versions):
+                        state.pop(page, None)
+            pages.clear()
+            pages.update(found)
+            for page in found:
+                if page not in refreshers:
+                    load_metrics_snapshot(page)
+                    refreshers[page] = asyncio.create_task(refresh_page_periodically(page))
+            await asyncio.sleep(METRICS_REFRESH_INTERVAL)
+    finally:
+        for refresher in refreshers.values():
+            refresher.cancel()
+
+
+async def watch_snapshots():
+    """Reload each page's snapshot whenever collector.py replaces its files.
+
+    Used instead of schedule_pages() when METRICS_COLLECTOR=external, so any
+    number of API workers share one collector's Graph and OpenAI traffic.
+    """
+    pages_loaded = None
+    while True:
+        if pages_loaded is None or time.monotonic() - pages_loaded >= METRICS_REFRESH_INTERVAL:
+            found = await reload_pages()
+            for page in list(pages):
+                if page not in found:
+                    for state in (snapshots, post_tables, snapshot_versions):
+                        state.pop(page, None)
+            pages.clear()
+            pages.update(found)
+            pages_loaded = time.monotonic()
+        for page in list(pages):
+            try:
+                apply_page_snapshot(page, *await asyncio.to_thread(read_page_snapshot, page))
+            except ValueError as e:
+                print(f"[DEBUG] Could not reload the snapshot of page {page}: {str(e)}", file=sys.stderr)
+        await asyncio.sleep(SNAPSHOT_POLL_INTERVAL)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Compress the static assets once, before the first request
+    await asyncio.to_thread(static_assets.load)
+    # Serve the snapshots from the previous run right away and refresh in the background
+    if DEFAULT_PAGE_ID:
+        pages[DEFAULT_PAGE_ID] = access_token
+        load_metrics_snapshot(DEFAULT_PAGE_ID)
+    if METRICS_COLLECTOR == "external":
+        scheduler = asyncio.create_task(watch_snapshots())
+    else:
+        scheduler = asyncio.create_task(schedule_pages())
+    yield
+    scheduler.cancel()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Add favicon handling
 @app.get('/favicon.ico')
-async def get_favicon():
-    favicon_path = os.path.join(BASE_DIR, 'static', 'favicon.ico')
-    if os.path.exists(favicon_path):
-        return FileResponse(favicon_path)
-    else:
-        from fastapi.responses import Response
-        return Response(status_code=204)
+async def get_favicon(request: Request):
+    if static_assets.get('favicon.ico') is not None:
+        return static_assets.respond(request, 'favicon.ico')
+    return Response(status_code=204)
 
 # Allow all origins (for local development)
 app.add_middleware(
@@ -358,37 +429,79 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latencies by route, exposed on /metrics
+app.add_middleware(HTTPMetricsMiddleware)
+
 # Serve static files (HTML, JS, CSS, etc.)
-app.mount("/static", StaticFiles(directory="static"), name="static")
+@app.get("/static/{name:path}")
+async def get_static(request: Request, name: str):
+    return static_assets.respond(request, name)
 
 @app.get("/")
-def read_index():
-    return FileResponse("static/FB-Analytics-Dashboard.html")
+async def read_index(request: Request):
+    return static_assets.respond(request, DASHBOARD)
 
 @app.get("/papi/facebook-metrics")
-def get_facebook_metrics(demo: bool = False):
+async def get_facebook_metrics(
+    request: Request,
+    demo: bool = False,
+    page_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    page_size: Optional[int] = Query(None, ge=1, le=100),
+):
     try:
         if demo:
-            with open(os.path.join(BASE_DIR, 'static', 'dummydata.json')) as f:
-                return json.load(f)
-        else:
-            # Read from fb_metrics.json which includes AI insights
-            metrics_file = os.path.join(BASE_DIR, 'fb_metrics.json')
-            if os.path.exists(metrics_file):
-                with open(metrics_file, 'r') as f:
-                    metrics = json.load(f)
-                    return JSONResponse(content=metrics)
-            else:
-                # Fallback: generate fresh metrics if file doesn't exist
-                if not access_token or not page_id:
-                    return JSONResponse(
-                        content={"error": "Facebook credentials not found"}, 
-                        status_code=500
-                    )
-                
-                metrics = fetch_facebook_organic_metrics(page_id, access_token)
-                return JSONResponse(content=metrics)
-            
+            return static_assets.respond(request, DEMO_DATA)
+        page = page_id or DEFAULT_PAGE_ID or next(iter(pages), None)
+        if page and page not in pages and os.getenv("DB_HOST"):
+            # A page added to facebook_settings since the last reload: start collecting it now
+            from db import get_page_credentials
+            token = await asyncio.to_thread(get_page_credentials, page)
+            if token:
+                pages[page] = token
+                # With an external collector this worker only waits for the page's snapshot files
+                if METRICS_COLLECTOR != "external":
+                    task = asyncio.create_task(refresh_metrics(page))
+                    _page_refreshes.add(task)
+                    task.add_done_callback(_page_refreshes.discard)
+        if not page or page not in pages:
+            if not pages:
+                return JSONResponse(
+                    content={"error": "Facebook credentials not found"}, 
+                    status_code=500
+                )
+            return JSONResponse(content={"error": f"Unknown page {page}"}, status_code=404)
+        if since or until or page_size:
+            # Checked here: Graph would reject a bad value, and that is not a gateway error
+            try:
+                start = int(parse_time(since)) if since else None
+                end = int(parse_time(until, end_of_day=True)) if until else None
+            except (ValueError, OverflowError):
+                return JSONResponse(content={"error": "since and until must be unix timestamps or ISO dates"}, status_code=400)
+            if start is not None and end is not None and start > end:
+                return JSONResponse(content={"error": "since must not be after until"}, status_code=400)
+            # A custom date range is aggregated on demand (without AI insights). With an
+            # external collector the post store is the collector's: query Graph without it
+            store = None if METRICS_COLLECTOR == "external" else post_store
+            metrics = await asyncio.get_running_loop().run_in_executor(
+                _refresh_executor, lambda: collect_metrics(page, pages[page], start, end, page_size, store=store)
+            )
+            return JSONResponse(content=metrics)
+        # Last good snapshot (includes AI insights), kept fresh by the background refresher.
+        # Served straight from the event loop: no file read, no re-serialization
+        snapshot = snapshots.get(page)
+        if snapshot is not None:
+            return snapshot[1].respond(request)
+        return JSONResponse(
+            content={"error": "Metrics are still being collected, try again shortly"},
+            status_code=503,
+            headers={"Retry-After": "30"},
+        )
+
+    except GraphError as e:
+        # Facebook itself failed (after retries): report it as a gateway error
+        return JSONResponse(content={"error": str(e)}, status_code=502)
     except Exception as e:
         import traceback
         print(traceback.format_exc())
@@ -397,14 +510,150 @@ def get_facebook_metrics(demo: bool = False):
             status_code=500
         )
 
+def parse_time(value, end_of_day=False):
+    """Epoch seconds from a unix timestamp or an ISO date/datetime (UTC unless it has an offset)."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    # A bare date as the end of a range includes that whole day
+    if end_of_day and len(value) == 10:
+        return parsed.timestamp() + DAY - 1
+    return parsed.timestamp()
+
+
+@app.get("/papi/facebook-metrics/stream")
+async def stream_facebook_metrics(request: Request, page_id: Optional[str] = None):
+    """Server-sent events: the current snapshot, then a "diff" event after every refresh.
+
+    Diffs carry {"changed": {key: value}, "removed": [key]}. A client reconnecting
+    with the Last-Event-ID of the current snapshot skips the initial snapshot.
+    """
+    page = page_id or DEFAULT_PAGE_ID or next(iter(pages), None)
+    if not page or page not in pages:
+        return JSONResponse(content={"error": f"Unknown page {page}"}, status_code=404)
+    async def events():
+        # Subscribe before reading the snapshot so no refresh falls in between
+        queue = broadcaster.subscribe(page)
+        try:
+            snapshot = snapshots.get(page)
+            if snapshot is not None and request.headers.get("last-event-id") != snapshot[1].etag:
+                yield snapshot_event(snapshot[1])
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if event is RESYNC:
+                    # This client fell behind: send the whole current snapshot instead
+                    snapshot = snapshots.get(page)
+                    if snapshot is None:
+                        continue
+                    event = snapshot_event(snapshot[1])
+                yield event
+        finally:
+            broadcaster.unsubscribe(page, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/papi/facebook-metrics/history")
+async def get_facebook_metrics_history(
+    page_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    metrics: Optional[str] = None,
+    resolution: Optional[str] = Query(None, pattern="^(raw|hour|day|week)$"),
+    agg: str = Query("mean", pattern=f"^({'|'.join(AGGREGATES)})$"),
+):
+    """Metric series of a page between since and until (default: the last 30 days).
+
+    metrics is a comma-separated list (default: every tracked metric); resolution
+    downsamples to hourly, daily or weekly buckets aggregated with agg. Without
+    one, ranges up to 2 days are raw, up to 31 days hourly and longer ones daily
+    (weekly past 3 years); pass resolution=raw for every snapshot.
+    """
+    page = page_id or DEFAULT_PAGE_ID or next(iter(pages), None)
+    if not page or page not in pages:
+        return JSONResponse(content={"error": f"Unknown page {page}"}, status_code=404)
+    try:
+        end = parse_time(until, end_of_day=True) if until else time.time()
+        start = parse_time(since) if since else end - 30 * DAY
+    except ValueError:
+        return JSONResponse(content={"error": "since and until must be unix timestamps or ISO dates"}, status_code=400)
+    names = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else None
+    if resolution is None:
+        resolution = default_resolution(start, end) or "raw"
+
+    def query():
+        series = history_store.series(page, start, end, names, None if resolution == "raw" else resolution, agg)
+        body = {**series_json(*series), "page_id": page, "resolution": resolution}
+        # Encoded here too: for long raw ranges that is most of the work
+        return json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    return Response(content=await asyncio.to_thread(query), media_type="application/json")
+
+@app.get("/papi/posts")
+async def get_posts(
+    page_id: Optional[str] = None,
+    sort: str = Query("created_time", pattern=f"^({'|'.join(SORT_COLUMNS)})$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    kind: Optional[str] = Query(None, pattern=f"^({'|'.join(KINDS)})$"),
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """Per-post metrics of a page's last snapshot, sorted, filtered and paginated on the server.
+
+    Pass the returned next_cursor back as cursor (with the same other parameters)
+    for the following page.
+    """
+    page = page_id or DEFAULT_PAGE_ID or next(iter(pages), None)
+    if not page or page not in pages:
+        return JSONResponse(content={"error": f"Unknown page {page}"}, status_code=404)
+    table = post_tables.get(page)
+    if table is None:
+        return JSONResponse(
+            content={"error": "Posts are still being collected, try again shortly"},
+            status_code=503,
+            headers={"Retry-After": "30"},
+        )
+    try:
+        start = parse_time(since) if since else None
+        end = parse_time(until, end_of_day=True) if until else None
+        rows, next_cursor, total = table.query(sort, order, kind, start, end, limit, cursor)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    return {"page_id": page, "total": total, "posts": rows, "next_cursor": next_cursor}
+
+@app.get("/papi/graph-stats")
+def get_graph_stats():
+    """Per-endpoint Graph API request, error and retry counts with mean/max latency in seconds."""
+    stats = graph_stats.snapshot()
+    for endpoint in stats.values():
+        timed, total = endpoint.pop("timed"), endpoint.pop("latency_total")
+        endpoint["latency_mean"] = total / timed if timed else 0.0
+    return stats
+
+@app.get("/metrics")
+def get_prometheus_metrics():
+    """Pipeline stage timings, Graph, LLM token and HTTP counters in the Prometheus text format."""
+    body, content_type = exposition()
+    return Response(content=body, media_type=content_type)
+
 # Add a specific endpoint for demo data
 @app.get("/dummydata.json")
-def get_demo_data():
-    try:
-        with open(os.path.join(BASE_DIR, 'static', 'dummydata.json')) as f:
-            return json.load(f)
-    except Exception as e:
-        return JSONResponse(content={"error": str(e)}, status_code=500)
+async def get_demo_data(request: Request):
+    return static_assets.respond(request, DEMO_DATA)
 
 # Uncomment below to run the FastAPI app directly
 if __name__ == "__main__":
@@ -0,0 +1,74 @@
+"""Latency of the generate/evaluate loop against a local fake OpenAI endpoint.
+
+Compares the synchronous run_agentic_analysis with run_agentic_analysis_async,
+including a run whose latency budget is shorter than the full loop, then the
+async loop under each EVALUATOR_MODE when the first --bad-drafts generated
+analyses are incomplete and the LLM evaluator asks for one more round on the
+first complete one.
+
+    python benchmarks/bench_agents.py --latency 0.5 --feedback-rounds 2 --candidates 3 --bad-drafts 1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_openai import MockOpenAIServer  # noqa: E402
+
+SAMPLE_METRICS = {
+    "reach": 10000,
+    "engagementRate": 5.2,
+    "likes": 300,
+    "comments": 50,
+    "shares": 20,
+    "engagementTotal": 370,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per fake completion")
+    parser.add_argument("--feedback-rounds", type=int, default=2, help="evaluations answered with feedback")
+    parser.add_argument("--candidates", type=int, default=3)
+    parser.add_argument("--bad-drafts", type=int, default=1, help="generated analyses missing an insight")
+    args = parser.parse_args()
+
+    with MockOpenAIServer(latency=args.latency) as server:
+        os.environ["OPENAI_BASE_URL"] = server.url
+        os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+        import agent
+
+        def scenario(name, run, bad_drafts=0, feedback_rounds=args.feedback_rounds):
+            # Let calls abandoned by the previous scenario finish so they don't count here
+            time.sleep(args.latency)
+            # Each scenario sees the same number of feedback rounds
+            server._evaluations = server._drafts = 0
+            server.feedback_rounds = feedback_rounds
+            server.bad_drafts = bad_drafts
+            before = server.request_count
+            start = time.perf_counter()
+            analysis, outcome = run()
+            elapsed = time.perf_counter() - start
+            status = "pass" if outcome is None else str(outcome)[:60]
+            print(f"{name:38s} {elapsed:6.2f}s  {server.request_count - before:2d} calls  {status}")
+
+        scenario("sync loop", lambda: agent.run_agentic_analysis(SAMPLE_METRICS))
+        scenario("async loop, 1 candidate", lambda: asyncio.run(
+            agent.run_agentic_analysis_async(SAMPLE_METRICS, candidates=1)))
+        scenario(f"async loop, {args.candidates} candidates", lambda: asyncio.run(
+            agent.run_agentic_analysis_async(SAMPLE_METRICS, candidates=args.candidates)))
+        budget = args.latency * 3
+        scenario(f"async loop, {budget:.1f}s budget", lambda: asyncio.run(
+            agent.run_agentic_analysis_async(SAMPLE_METRICS, budget=budget)))
+        for mode in ("llm", "hybrid", "local"):
+            agent.EVALUATOR_MODE = mode
+            scenario(f"evaluator {mode}, {args.bad_drafts} bad draft(s)", lambda: asyncio.run(
+                agent.run_agentic_analysis_async(SAMPLE_METRICS, candidates=1)), bad_drafts=args.bad_drafts,
+                feedback_rounds=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Derived metrics over many rows: the scalar path row by row vs one vectorized pass.
+
+Builds `--rows` synthetic rows (posts, days or pages) and times add_derived_metrics
+on each row in a Python loop against compute_derived_metrics on the columns, for
+every row count up to --rows; the single-row case is what the refresher runs.
+
+    python benchmarks/bench_derived.py --rows 1,100,10000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from derived_metrics import add_derived_metrics, compute_derived_metrics  # noqa: E402
+
+INPUTS = ['reach', 'impressions', 'likes', 'comments', 'shares', 'websiteClicks', 'postSaves', 'ctaClicks',
+          'adSpend', 'tenSecondViews', 'videoViews', 'averageWatchTime']
+
+
+def columns(rows):
+    rng = np.random.default_rng(0)
+    data = {name: rng.integers(0, 5000, size=rows) for name in INPUTS}
+    data['totalFollowers'] = rng.integers(1, 50000, size=rows)
+    return data
+
+
+def timed(fn, repeat):
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        walls.append(time.perf_counter() - start)
+    return statistics.median(walls)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="1,100,10000", help="comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for rows in (int(count) for count in args.rows.split(",")):
+        data = columns(rows)
+        dicts = [{name: int(values[i]) for name, values in data.items()} for i in range(rows)]
+
+        def scalar():
+            for row in dicts:
+                add_derived_metrics(dict(row), row['totalFollowers'])
+
+        scalar_s = timed(scalar, args.repeat)
+        vector_s = timed(lambda: compute_derived_metrics(data), args.repeat)
+        print(f"{rows:7d} rows  scalar {scalar_s * 1000:9.3f}ms  vectorized {vector_s * 1000:9.3f}ms  "
+              f"({scalar_s / vector_s:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
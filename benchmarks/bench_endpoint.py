@@ -0,0 +1,79 @@
+"""Requests-per-second of the metrics endpoint: per-request file read vs cached body.
+
+Both handlers are mounted on a bare FastAPI app and driven in-process through
+httpx's ASGI transport, so the numbers reflect the handler's own cost.
+
+    python benchmarks/bench_endpoint.py --requests 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cached_response import CachedBody  # noqa: E402
+
+METRICS_FILE = os.path.join(ROOT, 'fb_metrics.json')
+
+
+def build_app():
+    app = FastAPI()
+    with open(METRICS_FILE) as f:
+        cached = CachedBody.from_json(json.load(f), last_modified=os.path.getmtime(METRICS_FILE))
+
+    @app.get("/file")
+    def from_file():
+        with open(METRICS_FILE, 'r') as f:
+            return JSONResponse(content=json.load(f))
+
+    @app.get("/cached")
+    async def from_cache(request: Request):
+        return cached.respond(request)
+
+    return app, cached
+
+
+async def hammer(client, path, total, concurrency, headers):
+    remaining = iter(range(total))
+    statuses = {}
+
+    async def worker():
+        for _ in remaining:
+            response = await client.get(path, headers=headers)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return total / (time.perf_counter() - start), statuses
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    app, cached = build_app()
+    scenarios = [
+        ("file read + json.load", "/file", {}),
+        ("cached body", "/cached", {}),
+        ("cached body, gzip", "/cached", {"Accept-Encoding": "gzip"}),
+        ("cached body, If-None-Match", "/cached", {"If-None-Match": cached.etag}),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path, headers in scenarios:
+            rps, statuses = await hammer(client, path, args.requests, args.concurrency, headers)
+            print(f"{name:30s} {rps:9.0f} req/s  {statuses}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
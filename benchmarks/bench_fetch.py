@@ -0,0 +1,71 @@
+"""Wall-clock benchmark of fetch_facebook_organic_metrics against the mock Graph API.
+
+    python benchmarks/bench_fetch.py --latency 0.05 --posts 20 --workers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the fetch path itself, not the per-token rate limit
+os.environ.setdefault("GRAPH_TOKEN_RATE", "0")
+
+from benchmarks.mock_graph import MockGraphServer  # noqa: E402
+from facebook_metrics import fetch_facebook_organic_metrics  # noqa: E402
+from graph import GraphCache, GraphClient  # noqa: E402
+from post_store import PostMetricStore  # noqa: E402
+
+
+def run(server, workers, store=None, cache=None):
+    before, calls_before = server.request_count, server.call_count
+    with GraphClient("mock-token", base_url=server.url, max_workers=workers, cache=cache) as client:
+        start = time.perf_counter()
+        metrics = fetch_facebook_organic_metrics("page", "mock-token", client=client, store=store)
+        elapsed = time.perf_counter() - start
+    return metrics, elapsed, server.request_count - before, server.call_count - calls_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per mock request")
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--videos", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--post-interval", type=float, default=86400, help="seconds between mock posts")
+    args = parser.parse_args()
+
+    server = MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos,
+                             post_interval=args.post_interval)
+    with server, tempfile.TemporaryDirectory() as tmp:
+        sequential, seq_time, seq_requests, seq_calls = run(server, 1)
+        concurrent, con_time, con_requests, con_calls = run(server, args.workers)
+        # Incremental refreshes: the first run fills the store, the second only refetches hot posts
+        store = PostMetricStore(os.path.join(tmp, "posts.db"))
+        cold, cold_time, _, cold_calls = run(server, args.workers, store)
+        warm, warm_time, _, warm_calls = run(server, args.workers, store)
+        store.close()
+        # Response cache: a repeated fetch within the TTL, then identical requests in flight at once
+        cache = GraphCache(ttl=300)
+        _, miss_time, _, miss_calls = run(server, args.workers, cache=cache)
+        cached, hit_time, _, hit_calls = run(server, args.workers, cache=cache)
+        before = server.request_count
+        with GraphClient("mock-token", base_url=server.url, max_workers=args.workers, cache=GraphCache(ttl=300)) as client:
+            client.get_many([("page", {"fields": "followers_count"})] * args.workers)
+        coalesced = server.request_count - before
+
+    assert sequential == concurrent == cold == warm == cached, "fetch modes produced different metrics"
+    print(f"sequential (1 worker):      {seq_time:7.3f}s  {seq_requests} HTTP requests for {seq_calls} Graph calls")
+    print(f"concurrent ({args.workers} workers):     {con_time:7.3f}s  {con_requests} HTTP requests for {con_calls} Graph calls")
+    print(f"speedup: {seq_time / con_time:.1f}x")
+    print(f"store, first refresh:       {cold_time:7.3f}s  {cold_calls} Graph calls")
+    print(f"store, steady state:        {warm_time:7.3f}s  {warm_calls} Graph calls "
+          f"({100 * (1 - warm_calls / cold_calls):.0f}% fewer)")
+    print(f"cache, first fetch:         {miss_time:7.3f}s  {miss_calls} Graph calls")
+    print(f"cache, refetch within TTL:  {hit_time:7.3f}s  {hit_calls} Graph calls")
+    print(f"{args.workers} identical concurrent GETs: {coalesced} HTTP request(s)")
+
+
+if __name__ == "__main__":
+    main()
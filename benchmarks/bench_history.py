@@ -0,0 +1,93 @@
+"""Range-query latency of the metric history store.
+
+Fills a temporary store with `--days` of 15-minute snapshots for `--pages` pages
+(numeric metrics modelled on fb_metrics.json), then times year-long queries of one
+page at each resolution (and the one the endpoint picks when none is given), with
+and without the JSON conversion the endpoint does.
+
+    python benchmarks/bench_history.py --pages 50 --days 365
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from history_store import DAY, MetricHistoryStore, default_resolution, numeric_metrics, series_json  # noqa: E402
+
+INTERVAL = 15 * 60
+
+
+def metric_names():
+    with open(os.path.join(ROOT, 'fb_metrics.json')) as f:
+        return sorted(numeric_metrics(json.load(f)))
+
+
+def fill(store, pages, days, names, end):
+    rng = np.random.default_rng(0)
+    timestamps = np.arange(end - days * DAY, end, INTERVAL, dtype=np.float64)
+    for page in range(pages):
+        # Slowly moving integer counts, like real snapshots
+        walks = np.abs(np.cumsum(rng.integers(-3, 4, size=(len(names), len(timestamps))), axis=1)) + 1000
+        store.extend(f"page{page}", timestamps, dict(zip(names, walks)))
+    return len(timestamps)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    names = metric_names()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        store = MetricHistoryStore(path)
+        end = (time.time() // DAY) * DAY
+        start = time.perf_counter()
+        per_page = fill(store, args.pages, args.days, names, end)
+        print(f"filled {args.pages} pages x {per_page} snapshots x {len(names)} metrics "
+              f"in {time.perf_counter() - start:.1f}s, {os.path.getsize(path) / 2**20:.1f} MiB")
+
+        page, since = f"page{args.pages // 2}", end - args.days * DAY
+        print(f"{'query (one page, whole range)':38s} {'series':>8s} {'+json':>8s}  points")
+        for label, metrics, resolution in [
+            ("raw, all metrics", None, None),
+            ("raw, 3 metrics", ["reach", "impressions", "engagementRate"], None),
+            ("hourly, all metrics", None, "hour"),
+            ("daily, all metrics", None, "day"),
+            ("weekly, all metrics", None, "week"),
+            (f"endpoint default ({default_resolution(since, end) or 'raw'}), all", None,
+             default_resolution(since, end)),
+        ]:
+            query = lambda: store.series(page, since, end, metrics, resolution)  # noqa: E731
+            points = len(query()[0])
+            series_ms = timed(query, args.repeat)
+            json_ms = timed(lambda: json.dumps(series_json(*query())), args.repeat)
+            print(f"{label:38s} {series_ms:6.1f}ms {json_ms:6.1f}ms  {points}")
+
+        start = time.perf_counter()
+        store.append(page, {name: 1.0 for name in names}, ts=end + 60)
+        print(f"append one snapshot: {(time.perf_counter() - start) * 1000:.1f}ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
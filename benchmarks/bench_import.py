@@ -0,0 +1,79 @@
+"""Cold start of the API process: time to import app.py, with and without the agent stack.
+
+Each measurement is a fresh interpreter, so nothing is cached in sys.modules.
+"app" is what serving needs now that agent.py is loaded on first use; "app + agent"
+is the old eager start (crewai, openai and their dependencies). The heaviest
+top-level imports of the lazy start are listed from `-X importtime`.
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must stay out of the serving path
+AGENT_STACK = ("agent", "crewai", "litellm", "openai")
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{imports}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {stack!r} if m in sys.modules))
+"""
+
+
+def measure(imports):
+    """Wall seconds of `imports` in a fresh interpreter, and which agent-stack modules got loaded."""
+    probe = PROBE.format(imports=imports, stack=AGENT_STACK)
+    result = subprocess.run([sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    elapsed, _, loaded = result.stdout.strip().splitlines()[-1].partition(" ")
+    return float(elapsed), loaded
+
+
+def heaviest_imports(imports, count):
+    """Direct imports of the probed module by cumulative import time (microseconds), from -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", imports], cwd=ROOT,
+                            capture_output=True, text=True)
+    costs = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        cumulative = cumulative.strip()
+        # Each nesting level adds two spaces of indent; keep what the probed module imports directly
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.isdigit() and depth == 1:
+            costs.append((int(cumulative), name.strip()))
+    return sorted(costs, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="heaviest imports to list")
+    args = parser.parse_args()
+
+    for label, imports in (("app", "import app"), ("app + agent", "import app, agent")):
+        try:
+            runs = [measure(imports) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{label:12s} failed: {e}")
+            continue
+        loaded = runs[-1][1] or "none"
+        print(f"{label:12s} median {statistics.median(t for t, _ in runs) * 1000:8.1f}ms  "
+              f"min {min(t for t, _ in runs) * 1000:8.1f}ms  agent stack loaded: {loaded}")
+
+    print("\nheaviest imports of app.py:")
+    for cumulative, name in heaviest_imports("import app", args.top):
+        print(f"  {name:24s} {cumulative / 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
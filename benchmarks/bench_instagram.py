@@ -0,0 +1,77 @@
+"""Facebook + Instagram collection against the mock Graph API: each platform alone,
+one after the other, and side by side as app.collect_metrics runs them.
+
+    python benchmarks/bench_instagram.py --latency 0.05 --posts 200 --media 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Measure the fetch path itself, not the per-token rate limit or the response cache
+os.environ.setdefault("GRAPH_TOKEN_RATE", "0")
+os.environ.setdefault("GRAPH_CACHE_TTL", "0")
+
+from benchmarks.mock_graph import MockGraphServer  # noqa: E402
+
+PAGE = "page"
+TOKEN = "mock-token"
+
+
+def timed(server, fn):
+    before = server.request_count
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, server.request_count - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds per mock request")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--media", type=int, default=200, help="Instagram media of the linked account")
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos,
+                         instagram=args.media) as server, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "GRAPH_API_URL": server.url,
+            "FACEBOOK_PAGE_ID": PAGE,
+            "FACEBOOK_PAGE_ACCESS_TOKEN": TOKEN,
+            "POST_STORE_PATH": os.path.join(tmp, "posts.db"),
+            "ANALYSIS_CACHE_PATH": os.path.join(tmp, "analysis.db"),
+            "HISTORY_STORE_PATH": os.path.join(tmp, "history.db"),
+        })
+        import app
+        from facebook_metrics import fetch_facebook_organic_metrics
+        from graph import GraphClient
+        from instagram_metrics import fetch_instagram_metrics
+
+        def facebook():
+            with GraphClient(TOKEN) as client:
+                return fetch_facebook_organic_metrics(PAGE, TOKEN, client=client, page_size=args.page_size)
+
+        def instagram():
+            with GraphClient(TOKEN) as client:
+                return fetch_instagram_metrics(f"ig_{PAGE}", TOKEN, client=client, page_size=args.page_size)
+
+        _, fb_time, fb_requests = timed(server, facebook)
+        _, ig_time, ig_requests = timed(server, instagram)
+        # Without a post store both runs crawl every object
+        both, both_time, both_requests = timed(
+            server, lambda: app.collect_metrics(PAGE, TOKEN, page_size=args.page_size))
+
+    print(f"facebook only:              {fb_time:7.3f}s  {fb_requests} HTTP requests")
+    print(f"instagram only:             {ig_time:7.3f}s  {ig_requests} HTTP requests")
+    print(f"one after the other:        {fb_time + ig_time:7.3f}s")
+    print(f"one refresh, in parallel:   {both_time:7.3f}s  {both_requests} HTTP requests "
+          f"({(fb_time + ig_time) / both_time:.1f}x)")
+    print(f"instagram reach {both['instagram']['reach']}, facebook reach {both['reach']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Bytes and CPU per request of the dashboard shell and demo data: read from disk
+on every hit (FileResponse / json.load) vs precompressed assets served from memory.
+
+Both variants are mounted on a bare FastAPI app and driven in-process through
+httpx's ASGI transport, with a browser's Accept-Encoding; the last column is a
+repeat visit revalidating with If-None-Match.
+
+    python benchmarks/bench_static.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from static_assets import StaticAssets  # noqa: E402
+
+STATIC_DIR = os.path.join(ROOT, "static")
+SHELL = "FB-Analytics-Dashboard.html"
+DEMO = "dummydata.json"
+
+
+def build_app():
+    app = FastAPI()
+    assets = StaticAssets(STATIC_DIR)
+    assets.load()
+
+    @app.get("/disk/shell")
+    def shell_from_disk():
+        return FileResponse(os.path.join(STATIC_DIR, SHELL))
+
+    @app.get("/disk/demo")
+    def demo_from_disk():
+        with open(os.path.join(STATIC_DIR, DEMO)) as f:
+            return json.load(f)
+
+    @app.get("/memory/shell")
+    async def shell_from_memory(request: Request):
+        return assets.respond(request, SHELL)
+
+    @app.get("/memory/demo")
+    async def demo_from_memory(request: Request):
+        return assets.respond(request, DEMO)
+
+    return app
+
+
+async def load(app, path, requests, concurrency, revalidate=False):
+    transport = httpx.ASGITransport(app=app)
+    headers = {"Accept-Encoding": "br, gzip"}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        first = await client.get(path, headers=headers)
+        if revalidate and "etag" in first.headers:
+            headers["If-None-Match"] = first.headers["etag"]
+        remaining = iter(range(requests))
+        sent = []
+
+        async def worker():
+            for _ in remaining:
+                response = await client.get(path, headers=headers)
+                # Bytes on the wire: the (compressed) body, none for a 304
+                sent.append(int(response.headers.get("content-length", 0)))
+
+        start = time.process_time()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        cpu = time.process_time() - start
+    return cpu / requests * 1e6, sum(sent) / len(sent), first.headers.get("cache-control", "-")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    app = build_app()
+    print(f"{'':16s} {'CPU/request':>12s} {'bytes/request':>14s} {'revalidated':>12s}  Cache-Control")
+    for asset in ("shell", "demo"):
+        for source in ("disk", "memory"):
+            path = f"/{source}/{asset}"
+            cpu, size, cache_control = asyncio.run(load(app, path, args.requests, args.concurrency))
+            _, revalidated, _ = asyncio.run(load(app, path, args.requests, args.concurrency, revalidate=True))
+            print(f"{asset + ' from ' + source:16s} {cpu:10.0f}us {size:14.0f} {revalidated:12.0f}  {cache_control}")
+
+
+if __name__ == "__main__":
+    main()
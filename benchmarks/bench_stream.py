@@ -0,0 +1,78 @@
+"""Fan-out cost of pushing metric diffs to many dashboards vs having them poll.
+
+Subscribes `--clients` in-process listeners to the broadcaster, publishes the
+diff a typical refresh produces (followers moved, so the follower-based rates
+change too) and times delivery to every listener. Polling numbers are what the
+same dashboards would send over one refresh interval.
+
+    python benchmarks/bench_stream.py --clients 1000 --poll-every 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from broadcaster import Broadcaster, diff_event, sse_event  # noqa: E402
+from cached_response import CachedBody  # noqa: E402
+
+
+def refreshed(metrics):
+    updated = dict(metrics)
+    followers = (metrics.get("totalFollowers") or 1000) + 25
+    updated["totalFollowers"] = followers
+    for key in ("reachRate", "audienceSaturation"):
+        if isinstance(metrics.get(key), (int, float)):
+            updated[key] = round(metrics[key] * 0.99, 2)
+    return updated
+
+
+async def fan_out(clients, event):
+    broadcaster = Broadcaster(queue_size=4)
+    received = []
+
+    async def listen(queue):
+        await queue.get()
+        received.append(time.perf_counter())
+
+    listeners = [asyncio.create_task(listen(broadcaster.subscribe("page"))) for _ in range(clients)]
+    await asyncio.sleep(0)  # let every listener start waiting
+    start = time.perf_counter()
+    broadcaster.publish("page", event)
+    published = time.perf_counter() - start
+    await asyncio.gather(*listeners)
+    delays = sorted((t - start) * 1000 for t in received)
+    return published * 1000, statistics.median(delays), delays[int(len(delays) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--poll-every", type=float, default=30, help="seconds between dashboard polls")
+    parser.add_argument("--refresh-interval", type=float, default=900, help="seconds between refreshes")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "fb_metrics.json")) as f:
+        before = json.load(f)
+    after = refreshed(before)
+    body = CachedBody.from_json(after)
+    full = sse_event("snapshot", body.variants["identity"][0], body.etag)
+    diff = diff_event(before, after, body.etag)
+
+    published, p50, p99 = asyncio.run(fan_out(args.clients, diff))
+    polls = args.clients * args.refresh_interval / args.poll_every
+    print(f"full snapshot event: {len(full):6d} bytes, diff event: {len(diff):4d} bytes")
+    print(f"push to {args.clients} dashboards: publish {published:.2f}ms, "
+          f"delivered p50 {p50:.2f}ms / p99 {p99:.2f}ms, {args.clients * len(diff) / 1024:.0f} KiB sent")
+    print(f"polling every {args.poll_every:.0f}s over one {args.refresh_interval:.0f}s refresh: "
+          f"{polls:.0f} requests, {args.clients * len(body.variants['identity'][0]) / 1024:.0f} KiB "
+          f"of changed bodies + {polls - args.clients:.0f} 304s, new data seen {args.poll_every / 2:.0f}s late on average")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Graph client behaviour under flaky responses and a tight rate limit, against the mock Graph API.
+
+Runs a full fetch while the mock fails a fraction of requests, then while it
+enforces a small rolling quota, once with the usage-driven throttle and once
+with it disabled (slowdown and pause thresholds out of reach).
+
+    python benchmarks/bench_throttle.py --fail-rate 0.2 --quota 40 --window 2
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Only the mock's quota limits the request rate here
+os.environ.setdefault("GRAPH_TOKEN_RATE", "0")
+
+import graph  # noqa: E402
+from benchmarks.mock_graph import MockGraphServer  # noqa: E402
+from facebook_metrics import fetch_facebook_organic_metrics  # noqa: E402
+from graph import GraphClient, GraphError  # noqa: E402
+
+
+def run(server, token, workers):
+    before = server.request_count
+    start = time.perf_counter()
+    try:
+        with GraphClient(token, base_url=server.url, max_workers=workers) as client:
+            metrics = fetch_facebook_organic_metrics("page", token, client=client)
+            retries = client.retry_count
+        outcome = "ok"
+    except GraphError as e:
+        metrics, retries, outcome = None, "-", f"failed: {e}"
+    return metrics, time.perf_counter() - start, server.request_count - before, retries, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.01, help="seconds per mock request")
+    parser.add_argument("--posts", type=int, default=400)
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--fail-rate", type=float, default=0.2)
+    parser.add_argument("--quota", type=int, default=20, help="mock requests allowed per window")
+    parser.add_argument("--window", type=float, default=1.0, help="mock quota window in seconds")
+    args = parser.parse_args()
+
+    # Scale the waits to the mock's window instead of Facebook's hour
+    graph.GRAPH_BACKOFF_BASE = 0.05
+    graph.GRAPH_USAGE_PAUSE_SECONDS = args.window / 2
+    # Small edge pages so the fetch takes enough requests to run into the quota
+    page_size = 10
+
+    def fetch(label, server, token):
+        metrics, elapsed, requests_sent, retries, outcome = run(server, token, args.workers)
+        print(f"{label:32s} {elapsed:6.2f}s  {requests_sent:4d} requests  {retries!s:>4s} retries  "
+              f"{server.failures:3d} failures  {server.throttled:3d} throttled  {outcome}")
+        return metrics
+
+    baseline = MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos)
+    graph.GRAPH_PAGE_SIZE = page_size
+    with baseline:
+        expected = fetch("reliable", baseline, "token-reliable")
+    with MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos,
+                         fail_rate=args.fail_rate) as server:
+        flaky = fetch(f"{args.fail_rate:.0%} transient failures", server, "token-flaky")
+    print(f"same totals despite failures: {flaky == expected}")
+
+    with MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos,
+                         quota=args.quota, window=args.window) as server:
+        fetch("quota, adaptive throttle", server, "token-adaptive")
+    slowdown, pause = graph.GRAPH_USAGE_SLOWDOWN, graph.GRAPH_USAGE_PAUSE
+    graph.GRAPH_USAGE_SLOWDOWN = graph.GRAPH_USAGE_PAUSE = 1000
+    with MockGraphServer(latency=args.latency, posts=args.posts, videos=args.videos,
+                         quota=args.quota, window=args.window) as server:
+        fetch("quota, usage headers ignored", server, "token-blind")
+    graph.GRAPH_USAGE_SLOWDOWN, graph.GRAPH_USAGE_PAUSE = slowdown, pause
+
+
+if __name__ == "__main__":
+    main()
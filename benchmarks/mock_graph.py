@@ -0,0 +1,230 @@
+"""Local stand-in for the Graph API endpoints used by the collectors.
+
+Every response is derived from the object ID so repeated runs are comparable,
+and each request sleeps for a fixed latency to mimic the network round trip.
+With `instagram` media the page links an Instagram Business account
+("ig_<page>") whose /media edge and media insights are served too.
+Optionally a fraction of requests fail with a transient 500 (`fail_rate`), and
+a rolling quota of `quota` requests per `window` seconds is reported in
+X-App-Usage and enforced with Graph rate-limit errors (code 4).
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+def _seed(object_id):
+    return zlib.crc32(object_id.encode())
+
+
+def _graph_time(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+def _timestamp(value):
+    if value is None:
+        return None
+    if value.isdigit():
+        return float(value)
+    return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def _insights(names, object_id):
+    seed = _seed(object_id)
+    return {"data": [
+        {"name": name, "values": [{"value": (seed >> (i * 3)) % 1000}]}
+        for i, name in enumerate(names)
+    ]}
+
+
+class MockGraphServer:
+    def __init__(self, latency=0.02, posts=10, videos=5, followers=5000, post_interval=86400,
+                 fail_rate=0.0, quota=None, window=10.0, instagram=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.quota = quota
+        self.window = window
+        self.failures = 0
+        self.throttled = 0
+        self._recent = []
+        self._random = random.Random(0)
+        self.post_interval = post_interval  # seconds between consecutive posts, newest first
+        self.started = time.time()
+        self.posts = posts
+        self.videos = videos
+        self.followers = followers
+        self.instagram = instagram
+        self.request_count = 0
+        self.call_count = 0  # Graph calls served, counting each batch sub-request
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v18.0"
+
+    def respond(self, path, params):
+        parts = [p for p in path.split("/") if p][1:]  # drop the version prefix
+        if len(parts) == 2 and parts[1] in ("posts", "videos"):
+            count, prefix = (self.posts, f"{parts[0]}_") if parts[1] == "posts" else (self.videos, "v")
+            return self._list(path, params, count, prefix)
+        if len(parts) == 2 and parts[1] == "media" and parts[0].startswith("ig_"):
+            return self._list(path, params, self.instagram, "m")
+        if len(parts) == 2 and parts[1] == "insights":
+            return _insights(params.get("metric", "").split(","), parts[0])
+        if len(parts) == 1:
+            object_id = parts[0]
+            fields = params.get("fields", "")
+            if "followers_count" in fields.split(","):
+                body = {"id": object_id, "followers_count": self.followers}
+                if "instagram_business_account" in fields.split(",") and self.instagram:
+                    body["instagram_business_account"] = {"id": f"ig_{object_id}"}
+                return body
+            seed = _seed(object_id)
+            body = {
+                "id": object_id,
+                "from": {"name": "Mock Page"},
+                "likes": {"summary": {"total_count": seed % 97}},
+                "comments": {"summary": {"total_count": seed % 31}},
+                "shares": {"count": seed % 13},
+                "reactions": {"summary": {"total_count": seed % 113}},
+            }
+            expansion = re.search(r"insights\.metric\(([^)]*)\)", fields)
+            if expansion:
+                body["insights"] = _insights(expansion.group(1).split(","), object_id)
+            return body
+        return {"error": {"message": f"Unknown path {path}", "code": 100}}
+
+    def _list(self, path, params, count, prefix):
+        """Page through `count` objects, newest first, honouring since/until and cursors."""
+        since, until = _timestamp(params.get("since")), _timestamp(params.get("until"))
+        limit = int(params.get("limit", 25))
+        offset = int(params.get("after", 0))
+        data = []
+        index = offset
+        while index < count and len(data) < limit:
+            created = self.started - index * self.post_interval
+            index += 1
+            if until is not None and created > until:
+                continue
+            if since is not None and created < since:
+                index = count  # everything older is outside the range too
+                break
+            obj = {"id": f"{prefix}{index - 1}"}
+            fields = params.get("fields", "").split(",")
+            # Instagram media carry their time as "timestamp"
+            obj["timestamp" if "timestamp" in fields else "created_time"] = _graph_time(created)
+            for field in ("message", "description", "caption"):
+                if field in fields:
+                    obj[field] = f"Mock {field} {index - 1}"
+            if "permalink_url" in fields:
+                obj["permalink_url"] = f"https://www.facebook.com/{obj['id']}"
+            if "permalink" in fields:
+                obj["permalink"] = f"https://www.instagram.com/p/{obj['id']}"
+            if "media_type" in fields:
+                obj["media_type"] = "VIDEO" if (index - 1) % 4 == 0 else "IMAGE"
+            seed = _seed(obj["id"])
+            if "like_count" in fields:
+                obj["like_count"] = seed % 89
+            if "comments_count" in fields:
+                obj["comments_count"] = seed % 23
+            data.append(obj)
+        body = {"data": data}
+        if index < count and data:
+            body["paging"] = {"next": f"{self.url}{path[len('/v18.0'):]}?{urlencode({**params, 'after': index})}"}
+        return body
+
+    def admit(self):
+        """Apply the failure rate and quota to one request: (error body or None, usage headers)."""
+        with self._lock:
+            headers = {}
+            if self.quota:
+                now = time.monotonic()
+                self._recent = [t for t in self._recent if t > now - self.window]
+                if len(self._recent) >= self.quota:
+                    self.throttled += 1
+                    headers["X-App-Usage"] = json.dumps({"call_count": 100, "total_time": 0, "total_cputime": 0})
+                    return (403, {"error": {"message": "Application request limit reached", "code": 4}}), headers
+                self._recent.append(now)
+                usage = int(100 * len(self._recent) / self.quota)
+                headers["X-App-Usage"] = json.dumps({"call_count": usage, "total_time": 0, "total_cputime": 0})
+            if self._random.random() < self.fail_rate:
+                self.failures += 1
+                return (500, {"error": {"message": "An unexpected error has occurred", "code": 2,
+                                        "is_transient": True}}), headers
+            return None, headers
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with mock._lock:
+                    mock.request_count += 1
+                    mock.call_count += 1
+                time.sleep(mock.latency)
+                error, headers = mock.admit()
+                if error:
+                    return self._send(error[1], error[0], headers)
+                parsed = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                self._send(mock.respond(parsed.path, params), headers=headers)
+
+            def do_POST(self):
+                with mock._lock:
+                    mock.request_count += 1
+                time.sleep(mock.latency)
+                length = int(self.headers.get("Content-Length", 0))
+                form = {k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()}
+                error, headers = mock.admit()
+                if error:
+                    return self._send(error[1], error[0], headers)
+                calls = json.loads(form.get("batch", "[]"))
+                with mock._lock:
+                    mock.call_count += len(calls)
+                results = []
+                for call in calls:
+                    parsed = urlparse(call["relative_url"])
+                    params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                    body = mock.respond(f"/v18.0/{parsed.path.lstrip('/')}", params)
+                    results.append({"code": 200, "headers": [], "body": json.dumps(body)})
+                self._send(results, headers=headers)
+
+            def _send(self, payload, status=200, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
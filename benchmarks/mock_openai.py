@@ -0,0 +1,114 @@
+"""Local stand-in for the OpenAI chat completions endpoint used by agent.py.
+
+Point the OpenAI SDK at it with OPENAI_BASE_URL=<server.url>. Generator prompts
+get a fixed four-insight JSON answer (the first `bad_drafts` of them with an
+insight missing); evaluator prompts get "feedback" for an analysis with a
+missing insight, like a real evaluator, and otherwise "feedback" for the first
+`feedback_rounds` evaluations and "pass" afterwards.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from analysis_checks import MISSING_INSIGHT
+
+INSIGHTS = {
+    "engagementRateInsight": "Engagement rate is steady; keep posting at the current cadence and aim to keep it above 10%.",
+    "reachInsight": "Reach grew with video posts; schedule more short videos.",
+    "breakdownInsight": "Likes dominate engagement; prompt questions to grow comments by 20%.",
+    "summaryInsight": "Solid month overall; double down on video and conversation starters.",
+}
+
+
+class MockOpenAIServer:
+    def __init__(self, latency=0.5, feedback_rounds=0, bad_drafts=0):
+        self.latency = latency
+        self.feedback_rounds = feedback_rounds
+        self.bad_drafts = bad_drafts
+        self._drafts = 0
+        self.request_count = 0
+        self.prompt_chars = 0
+        self._evaluations = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def complete(self, prompt):
+        if "Evaluate the following" in prompt:
+            if MISSING_INSIGHT in prompt:
+                return json.dumps({"status": "feedback", "feedback": "Return all four insights."})
+            with self._lock:
+                self._evaluations += 1
+                passed = self._evaluations > self.feedback_rounds
+            if passed:
+                return json.dumps({"status": "pass"})
+            return json.dumps({"status": "feedback", "feedback": "Make the reach insight more specific."})
+        with self._lock:
+            self._drafts += 1
+            bad = self._drafts <= self.bad_drafts
+        if bad:
+            return json.dumps({k: v for k, v in INSIGHTS.items() if k != "summaryInsight"})
+        return json.dumps(INSIGHTS)
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+                with mock._lock:
+                    mock.request_count += 1
+                    mock.prompt_chars += len(prompt)
+                time.sleep(mock.latency)
+                content = mock.complete(prompt)
+                body = json.dumps({
+                    "id": f"chatcmpl-mock{mock.request_count}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": request.get("model", "gpt-3.5-turbo"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": len(prompt) // 4,
+                        "completion_tokens": len(content) // 4,
+                        "total_tokens": (len(prompt) + len(content)) // 4,
+                    },
+                }).encode()
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # the client gave up on this call (timeout or budget)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
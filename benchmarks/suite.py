@@ -0,0 +1,237 @@
+"""Benchmark suite of the metrics pipeline against the local mock Graph API and mock OpenAI.
+
+Stages: the Graph collection (fetch_facebook_organic_metrics, cold and with a
+warm post store), the derived-metric block, the generate/evaluate agent loop, a
+full background refresh through app.py, and the /papi/facebook-metrics endpoint
+(sequential requests, then --concurrency clients at once).
+Each stage reports its median wall time over --repeat runs, the requests it sent,
+p50/p99 latency where it makes sense and the peak Python heap of one extra traced
+run (mock servers run in-process and are included).
+
+    python benchmarks/suite.py --graph-latency 0.02 --posts 200 --page-size 50 --save baseline.json
+    python benchmarks/suite.py --compare baseline.json --tolerance 0.2
+
+With --compare the exit status is 1 when a stage got slower than the saved run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.mock_graph import MockGraphServer  # noqa: E402
+from benchmarks.mock_openai import MockOpenAIServer  # noqa: E402
+
+PAGE = "page"
+TOKEN = "mock-token"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_stage(fn, repeat):
+    """Median wall time over `repeat` runs, counters of the last run, then one traced run for memory."""
+    walls = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn() or {}
+        walls.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    latencies = result.pop("latencies", None)
+    report = {"wall_s": statistics.median(walls), "peak_kib": peak / 1024, **result}
+    if latencies:
+        report["p50_ms"] = percentile(latencies, 0.5) * 1000
+        report["p99_ms"] = percentile(latencies, 0.99) * 1000
+    return report
+
+
+def counting(fn, graph=None, openai=None):
+    """Run fn and add the requests it cost the mock servers."""
+    before = {
+        "graph_requests": graph and graph.request_count,
+        "graph_calls": graph and graph.call_count,
+        "llm_requests": openai and openai.request_count,
+    }
+    result = fn() or {}
+    if graph is not None:
+        result["graph_requests"] = graph.request_count - before["graph_requests"]
+        result["graph_calls"] = graph.call_count - before["graph_calls"]
+    if openai is not None:
+        result["llm_requests"] = openai.request_count - before["llm_requests"]
+    return result
+
+
+def stages(args, graph, openai, tmp):
+    from agent import run_agentic_analysis_async
+    from derived_metrics import add_derived_metrics
+    from facebook_metrics import fetch_facebook_organic_metrics
+    from graph import GraphClient
+    from post_store import PostMetricStore
+
+    def fetch(store=None):
+        with GraphClient(TOKEN, base_url=graph.url, max_workers=args.workers) as client:
+            return fetch_facebook_organic_metrics(PAGE, TOKEN, client=client, store=store, page_size=args.page_size)
+
+    metrics = fetch()
+    store = PostMetricStore(os.path.join(tmp, "posts.db"))
+    fetch(store)  # fill the store; the timed runs only refetch hot posts
+
+    def derived():
+        latencies = []
+        for _ in range(args.derived_iterations):
+            sample = dict(metrics)
+            start = time.perf_counter()
+            add_derived_metrics(sample, graph.followers)
+            latencies.append(time.perf_counter() - start)
+        return {"latencies": latencies}
+
+    def agents():
+        openai._evaluations = 0
+        asyncio.run(run_agentic_analysis_async(dict(metrics)))
+
+    yield "fetch (cold)", lambda: counting(lambda: fetch() and None, graph=graph)
+    yield "fetch (warm post store)", lambda: counting(lambda: fetch(store) and None, graph=graph)
+    yield "derived metrics", derived
+    yield "agent loop", lambda: counting(agents, openai=openai)
+
+    import app
+    from analysis_cache import AnalysisCache
+    from fastapi.testclient import TestClient
+
+    # Keep the app's snapshot file out of the repo and make every refresh call the LLM
+    app.METRICS_FILE = os.path.join(tmp, "fb_metrics.json")
+    app.analysis_cache = AnalysisCache(os.path.join(tmp, "analysis.db"), ttl=0)
+    app.pages[PAGE] = TOKEN
+
+    def refresh():
+        openai._evaluations = 0
+        return counting(lambda: asyncio.run(app.refresh_metrics(PAGE)), graph=graph, openai=openai)
+
+    yield "refresh (fetch + derived + agents)", refresh
+
+    client = TestClient(app.app)
+
+    def endpoint():
+        latencies = []
+        for _ in range(args.endpoint_requests):
+            start = time.perf_counter()
+            response = client.get("/papi/facebook-metrics", params={"page_id": PAGE})
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+        return {"requests": args.endpoint_requests, "latencies": latencies}
+
+    yield "endpoint /papi/facebook-metrics", endpoint
+
+    async def load():
+        # --concurrency clients sharing --endpoint-requests requests, in-process over ASGI
+        import httpx
+        latencies = []
+        remaining = iter(range(args.endpoint_requests))
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def worker():
+                for _ in remaining:
+                    start = time.perf_counter()
+                    await client.get("/papi/facebook-metrics", params={"page_id": PAGE},
+                                     headers={"Accept-Encoding": "gzip"})
+                    latencies.append(time.perf_counter() - start)
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        return {"requests": args.endpoint_requests, "latencies": latencies}
+
+    yield f"endpoint, {args.concurrency} concurrent clients", lambda: asyncio.run(load())
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--graph-latency", type=float, default=0.02, help="seconds per mock Graph request")
+    parser.add_argument("--openai-latency", type=float, default=0.2, help="seconds per mock completion")
+    parser.add_argument("--feedback-rounds", type=int, default=1, help="evaluations answered with feedback")
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--videos", type=int, default=50)
+    parser.add_argument("--page-size", type=int, default=100, help="objects listed per Graph page")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--derived-iterations", type=int, default=2000)
+    parser.add_argument("--endpoint-requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="clients in the endpoint load stage")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown before flagging")
+    args = parser.parse_args()
+
+    graph = MockGraphServer(latency=args.graph_latency, posts=args.posts, videos=args.videos,
+                            post_interval=3600)
+    openai = MockOpenAIServer(latency=args.openai_latency, feedback_rounds=args.feedback_rounds)
+    results = {}
+    with graph, openai, tempfile.TemporaryDirectory() as tmp:
+        os.environ.update({
+            "GRAPH_API_URL": graph.url,
+            # Measure the pipeline, not the per-token rate limit or the response cache
+            "GRAPH_TOKEN_RATE": "0",
+            "GRAPH_CACHE_TTL": "0",
+            "OPENAI_BASE_URL": openai.url,
+            "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY") or "mock-key",
+            "FACEBOOK_PAGE_ID": PAGE,
+            "FACEBOOK_PAGE_ACCESS_TOKEN": TOKEN,
+            "POST_STORE_PATH": os.path.join(tmp, "app_posts.db"),
+            "ANALYSIS_CACHE_PATH": os.path.join(tmp, "app_analysis.db"),
+            "HISTORY_STORE_PATH": os.path.join(tmp, "app_history.db"),
+        })
+        for name, fn in stages(args, graph, openai, tmp):
+            results[name] = run_stage(fn, args.repeat)
+            print(format_result(name, results[name]), flush=True)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        sys.exit(1 if compare(results, baseline, args.tolerance) else 0)
+
+
+def format_result(name, result):
+    line = f"{name:36s} {result['wall_s'] * 1000:9.1f}ms"
+    if "p50_ms" in result:
+        line += f"  p50 {result['p50_ms']:7.3f}ms  p99 {result['p99_ms']:7.3f}ms"
+    for key in ("requests", "graph_requests", "graph_calls", "llm_requests"):
+        if key in result:
+            line += f"  {result[key]} {key.replace('_', ' ')}"
+    return line + f"  peak {result['peak_kib']:.0f} KiB"
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of every stage against the baseline; returns True when any regressed."""
+    regressed = False
+    print(f"\ncompared with baseline (tolerance {tolerance:.0%}):")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key in ("wall_s", "p99_ms", "peak_kib"):
+            if key not in result or not before.get(key):
+                continue
+            change = result[key] / before[key] - 1
+            flag = change > tolerance
+            regressed |= flag
+            print(f"  {name:36s} {key:8s} {change:+7.1%}{'  REGRESSION' if flag else ''}")
+    return regressed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Events a slow subscriber may have queued before it is resynced with a full snapshot
+BROADCAST_QUEUE_SIZE = int(os.getenv("BROADCAST_QUEUE_SIZE", "16"))
+
+# Seconds between keep-alive comments on an idle event stream
+SSE_KEEPALIVE = float(os.getenv("SSE_KEEPALIVE", "15"))
+
+# Queued in place of the dropped events when a subscriber falls behind
+RESYNC = object()
+
+_LINE_END = re.compile(r"\r\n|\r|\n")
+
+
+def metrics_diff(old, new):
+    """Keys whose value changed or appeared, and keys that disappeared, between two snapshots."""
+    changed = {key: value for key, value in new.items() if key not in old or old[key] != value}
+    removed = [key for key in old if key not in new]
+    return {"changed": changed, "removed": removed}
+
+
+def sse_event(event, data, event_id=None):
+    """One server-sent event of (already serialized) JSON.
+
+    Multi-line data (e.g. a pretty-printed snapshot file) goes out as one
+    "data:" field per line; clients join them back with newlines.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8")
+    lines = [f"event: {event}"]
+    if event_id:
+        lines.append(f"id: {event_id}")
+    # Split on the line endings of the SSE format only (str.splitlines also breaks on U+2028)
+    lines.extend(f"data: {line}" for line in _LINE_END.split(data))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Broadcaster:
+    """Fans events out to every subscriber of a page.
+
+    Events are encoded once by the publisher and the same bytes are queued for
+    every subscriber, so the cost per open dashboard is a queue append. A
+    subscriber whose queue is full is resynced (its backlog replaced by RESYNC)
+    instead of slowing down the others. Must be used from the event loop thread.
+    """
+
+    def __init__(self, queue_size=None):
+        self.queue_size = queue_size or BROADCAST_QUEUE_SIZE
+        self._subscribers = {}  # page_id -> set of asyncio.Queue
+
+    def subscribe(self, page):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(page, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, page, queue):
+        queues = self._subscribers.get(page)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[page]
+
+    def subscriber_count(self, page=None):
+        if page is not None:
+            return len(self._subscribers.get(page, ()))
+        return sum(len(queues) for queues in self._subscribers.values())
+
+    def publish(self, page, event):
+        for queue in self._subscribers.get(page, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC)
+
+
+def diff_event(old, new, event_id=None):
+    """The "diff" event between two snapshots, or None when nothing changed."""
+    diff = metrics_diff(old, new)
+    if not diff["changed"] and not diff["removed"]:
+        return None
+    return sse_event("diff", json.dumps(diff, ensure_ascii=False, separators=(",", ":")), event_id)
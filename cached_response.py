@@ -0,0 +1,80 @@
+import gzip
+import hashlib
+import json
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi.responses import Response
+
+try:
+    # Listed in requirements.txt; without it only gzip is offered
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this aren't worth compressing
+MIN_COMPRESS_SIZE = 512
+
+
+class CachedBody:
+    """A response body serialized and compressed once, then served many times.
+
+    Carries a content-hashed ETag and a Last-Modified date and answers
+    conditional requests (If-None-Match / If-Modified-Since) with 304.
+    """
+
+    def __init__(self, body, media_type="application/json", last_modified=None, cache_control="no-cache"):
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.last_modified = formatdate(last_modified or time.time(), usegmt=True)
+        digest = hashlib.sha1(body).hexdigest()[:16]
+        self.etag = f'"{digest}"'
+        # content-coding -> (encoded body, ETag of that representation)
+        self.variants = {"identity": (body, self.etag)}
+        if len(body) >= MIN_COMPRESS_SIZE:
+            self.variants["gzip"] = (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gz"')
+            if brotli is not None:
+                self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+        self._etags = {etag for _, etag in self.variants.values()}
+
+    @classmethod
+    def from_json(cls, content, **kwargs):
+        # Same encoding as JSONResponse
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        return cls(body, **kwargs)
+
+    def _encoding(self, accept_encoding):
+        offered = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+        for coding in ("br", "gzip"):
+            if coding in offered and coding in self.variants:
+                return coding
+        return "identity"
+
+    def _not_modified(self, request):
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            return "*" in tags or bool(tags & self._etags)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(self.last_modified)
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def respond(self, request, headers=None):
+        coding = self._encoding(request.headers.get("accept-encoding", ""))
+        body, etag = self.variants[coding]
+        response_headers = {
+            "ETag": etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding",
+            **(headers or {}),
+        }
+        if self._not_modified(request):
+            return Response(status_code=304, headers=response_headers)
+        if coding != "identity":
+            response_headers["Content-Encoding"] = coding
+        return Response(content=body, media_type=self.media_type, headers=response_headers)
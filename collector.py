@@ -0,0 +1,50 @@
+"""Standalone metrics collector.
+
+Runs the Graph crawl and AI analysis of every configured page on the usual
+refresh schedule and publishes each result as snapshot files, replaced
+atomically. Start the API workers with METRICS_COLLECTOR=external so they only
+reload those files instead of each crawling on their own:
+
+    python collector.py --metrics-port 9101
+    METRICS_COLLECTOR=external uvicorn app:app --workers 4
+
+With --once every page is refreshed a single time and the collector exits
+(e.g. from cron).
+"""
+import argparse
+import asyncio
+import sys
+
+from prometheus_client import start_http_server
+
+import app
+
+
+async def refresh_once(only=None):
+    app.pages.update(await app.reload_pages())
+    targets = [page for page in app.pages if not only or page in only]
+    for page in targets:
+        # Seed the previous snapshot so history and diffs continue from it
+        app.load_metrics_snapshot(page)
+    await asyncio.gather(*(app.refresh_metrics(page) for page in targets))
+    return targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--once", action="store_true", help="refresh every page once and exit")
+    parser.add_argument("--page", action="append", help="only refresh this page (with --once; repeatable)")
+    parser.add_argument("--metrics-port", type=int, help="serve the Prometheus metrics on this port")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        start_http_server(args.metrics_port)
+    if args.once:
+        refreshed = asyncio.run(refresh_once(args.page))
+        print(f"[DEBUG] Collector refreshed {len(refreshed)} page(s).", file=sys.stderr)
+    else:
+        asyncio.run(app.schedule_pages())
+
+
+if __name__ == "__main__":
+    main()
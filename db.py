@@ -1,6 +1,11 @@
 import psycopg2
+import psycopg2.pool
 import json
 import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -14,47 +19,190 @@ db_name = os.getenv('DB_NAME')
 db_user = os.getenv('DB_USER')
 db_password = os.getenv('DB_PASSWORD')
 
-# Validate that all required environment variables are set
-required_vars = {
-    'DB_HOST': db_host,
-    'DB_PORT': db_port,
-    'DB_NAME': db_name,
-    'DB_USER': db_user,
-    'DB_PASSWORD': db_password
-}
+# Connection pool bounds
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
 
-missing_vars = [var for var, value in required_vars.items() if not value]
-if missing_vars:
-    raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}. Please set them in .env file.")
+# Seconds page credentials are served from memory before being re-read
+CREDENTIALS_CACHE_TTL = float(os.getenv('CREDENTIALS_CACHE_TTL', '300'))
 
-db_config = {
-    'host': db_host,
-    'port': int(db_port),
-    'database': db_name,
-    'user': db_user,
-    'password': db_password
-}
+# Seconds a page found missing from facebook_settings is answered as unknown without a query
+CREDENTIALS_MISS_TTL = float(os.getenv('CREDENTIALS_MISS_TTL', '30'))
 
-# ---- Function to Fetch Data ----
-def fetch_facebook_settings(record_id):
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def db_config():
+    # Validate that all required environment variables are set
+    required_vars = {
+        'DB_HOST': db_host,
+        'DB_PORT': db_port,
+        'DB_NAME': db_name,
+        'DB_USER': db_user,
+        'DB_PASSWORD': db_password
+    }
+
+    missing_vars = [var for var, value in required_vars.items() if not value]
+    if missing_vars:
+        raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}. Please set them in .env file.")
+
+    return {
+        'host': db_host,
+        'port': int(db_port),
+        'database': db_name,
+        'user': db_user,
+        'password': db_password
+    }
+
+
+def get_pool():
+    """The process-wide connection pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = psycopg2.pool.ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **db_config())
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; broken connections are discarded instead of reused."""
+    pool = get_pool()
+    conn = pool.getconn()
     try:
-        # Connect to DB
-        conn = psycopg2.connect(**db_config)
-        cursor = conn.cursor()
+        yield conn
+        conn.commit()
+    except Exception:
+        # Start from a clean slate rather than trust which statements survived
+        _prepared.pop(conn, None)
+        if not conn.closed:
+            try:
+                conn.rollback()
+                with conn.cursor() as cursor:
+                    cursor.execute("DEALLOCATE ALL")
+                conn.commit()
+            except psycopg2.Error:
+                pass
+        raise
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
 
-        # Query
-        query = """
+
+# ---- Prepared lookups ----
+# Statements are prepared once per pooled connection and then run with EXECUTE
+PREPARED_STATEMENTS = {
+    'settings_by_id': """
+        PREPARE settings_by_id (integer) AS
+        SELECT page_id, page_access_token
+        FROM facebook_settings
+        WHERE id = $1
+    """,
+    'credentials_by_page': """
+        PREPARE credentials_by_page (text[]) AS
+        SELECT page_id, page_access_token
+        FROM facebook_settings
+        WHERE page_id = ANY($1) AND page_access_token IS NOT NULL
+    """,
+    'all_settings': """
+        PREPARE all_settings AS
         SELECT page_id, page_access_token
         FROM facebook_settings
-        WHERE id = %s;
-        """
-        cursor.execute(query, (record_id,))
-        result = cursor.fetchone()
+        WHERE page_id IS NOT NULL AND page_access_token IS NOT NULL
+        ORDER BY id
+    """,
+}
+_prepared = weakref.WeakKeyDictionary()
+
 
-        if result:
+def execute_prepared(conn, name, params=()):
+    prepared = _prepared.setdefault(conn, set())
+    with conn.cursor() as cursor:
+        if name not in prepared:
+            cursor.execute(PREPARED_STATEMENTS[name])
+            prepared.add(name)
+        if params:
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+        else:
+            cursor.execute(f"EXECUTE {name}")
+        return cursor.fetchall()
+
+
+# ---- Page credentials cache ----
+_credentials = {}  # page_id -> (page_access_token or None when not configured, fetched_at)
+_credentials_lock = threading.Lock()
+
+
+def _cache_credentials(rows, requested=()):
+    now = time.monotonic()
+    found = {str(page_id): token for page_id, token in rows}
+    with _credentials_lock:
+        for page_id, token in found.items():
+            _credentials[page_id] = (token, now)
+        # Remember requested pages that aren't configured, so repeated lookups skip the database
+        for page_id in requested:
+            if page_id not in found:
+                _credentials[page_id] = (None, now)
+    return found
+
+
+def invalidate_credentials(page_id=None):
+    """Forget cached credentials for one page, or for every page."""
+    with _credentials_lock:
+        if page_id is None:
+            _credentials.clear()
+        else:
+            _credentials.pop(str(page_id), None)
+
+
+def get_page_credentials_many(page_ids):
+    """Return {page_id: page_access_token} for the given pages, reading uncached ones in one query.
+
+    Pages that aren't configured are left out, and stay cached as unknown for
+    CREDENTIALS_MISS_TTL seconds.
+    """
+    page_ids = [str(page_id) for page_id in page_ids]
+    now = time.monotonic()
+    found, missing = {}, []
+    with _credentials_lock:
+        for page_id in page_ids:
+            cached = _credentials.get(page_id)
+            ttl = CREDENTIALS_MISS_TTL if cached and cached[0] is None else CREDENTIALS_CACHE_TTL
+            if cached and now - cached[1] < ttl:
+                if cached[0] is not None:
+                    found[page_id] = cached[0]
+            else:
+                missing.append(page_id)
+    if missing:
+        with connection() as conn:
+            rows = execute_prepared(conn, 'credentials_by_page', (missing,))
+        found.update(_cache_credentials(rows, requested=missing))
+    return found
+
+
+def get_page_credentials(page_id):
+    """Access token of one page, or None when the page isn't configured."""
+    return get_page_credentials_many([page_id]).get(str(page_id))
+
+
+# ---- Function to Fetch Data ----
+def fetch_facebook_settings(record_id):
+    try:
+        with connection() as conn:
+            rows = execute_prepared(conn, 'settings_by_id', (record_id,))
+
+        if rows:
             data = {
-                'page_id': result[0],
-                'page_access_token': result[1]
+                'page_id': rows[0][0],
+                'page_access_token': rows[0][1]
             }
 
             # Write to JSON file
@@ -66,11 +214,15 @@ def fetch_facebook_settings(record_id):
         else:
             print("No record found with that ID.")
 
-        cursor.close()
-        conn.close()
-
     except Exception as e:
         print("Error:", e)
 
+# ---- Fetch every configured page (used by the multi-page metrics service) ----
+def fetch_all_facebook_settings():
+    """Return {page_id: page_access_token} for every row with both values set, in one query."""
+    with connection() as conn:
+        return _cache_credentials(execute_prepared(conn, 'all_settings'))
+
 # ---- Call the function with the ID you want to fetch ----
-fetch_facebook_settings(2)  # Change 1 to the actual ID
+if __name__ == "__main__":
+    fetch_facebook_settings(2)  # Change 1 to the actual ID
@@ -0,0 +1,152 @@
+import numpy as np
+
+# Inputs the Graph API doesn't provide yet; replace with real values when available
+PLACEHOLDER_INPUTS = {
+    'revenue': 0,
+    'newCustomers': 0,
+    'maxBid': 1,
+    'dailyBudget': 1,
+    'qualityRanking': 0,
+    'engagementRanking': 0,
+    'conversionRanking': 0,
+    'conversionsDuringLearning': 0,
+    'campaignRevenue': 0,
+    'baselineRevenue': 0,
+    'videoDuration': 1,
+}
+
+# (metric, numerator, denominator, scale), evaluated in order so earlier metrics can
+# feed later ones. A tuple numerator is summed ('-' subtracts a term); a numeric
+# operand is a constant. With no denominator the metric is the plain numerator total.
+# Ratios are rounded to 2 decimals and are 0 wherever the denominator is not positive.
+DERIVED_METRICS = [
+    # Engagement Total: Likes + Comments + Shares
+    ('engagementTotal', ('likes', 'comments', 'shares'), None, 1),
+    # Engagement Rate: Total Engagements ÷ Reach × 100
+    ('engagementRate', 'engagementTotal', 'reach', 100),
+    # Frequency: Impressions ÷ Reach
+    ('frequency', 'impressions', 'reach', 1),
+    # Reach Rate: Reach ÷ Total Followers × 100
+    ('reachRate', 'reach', 'totalFollowers', 100),
+    ('totalFollowers', 'totalFollowers', None, 1),
+    # Impression Share: Your Impressions ÷ Total Available Impressions × 100
+    # (total available impressions placeholder: the page's own impressions)
+    ('impressionShare', 'impressions', 'impressions', 100),
+    ('totalAvailableImpressions', 'impressions', None, 1),
+    # Click-Through Rate: Total Clicks ÷ Impressions × 100 (websiteClicks as Total Clicks)
+    ('clickThroughRate', 'websiteClicks', 'impressions', 100),
+    # Comment Rate: Comments ÷ Reach × 100
+    ('commentRate', 'comments', 'reach', 100),
+    # Share Rate: Shares ÷ Reach × 100
+    ('shareRate', 'shares', 'reach', 100),
+    # Amplification Rate: Shares ÷ Total Engagements × 100
+    ('amplificationRate', 'shares', 'engagementTotal', 100),
+    # Applause Rate: Likes ÷ Total Engagements × 100
+    ('applauseRate', 'likes', 'engagementTotal', 100),
+    # Conversation Rate: Comments ÷ Total Engagements × 100
+    ('conversationRate', 'comments', 'engagementTotal', 100),
+    # Engagement Rate by Impressions: Total Engagements ÷ Impressions × 100
+    ('engagementByImpressions', 'engagementTotal', 'impressions', 100),
+    # Conversion Rate: Conversions ÷ Link Clicks × 100 (postSaves as Conversions, ctaClicks as Link Clicks)
+    ('conversionRate', 'postSaves', 'ctaClicks', 100),
+    # Cost Per Click (CPC): Ad Spend ÷ Total Clicks
+    ('costPerClick', 'adSpend', 'websiteClicks', 1),
+    # Cost Per Thousand Impressions (CPM): Ad Spend ÷ Impressions × 1000
+    ('costPerMille', 'adSpend', 'impressions', 1000),
+    # Save Rate: Post Saves ÷ Reach × 100
+    ('saveRate', 'postSaves', 'reach', 100),
+    # Return on Ad Spend (ROAS): Revenue ÷ Ad Spend × 100
+    ('returnOnAdSpend', 'revenue', 'adSpend', 100),
+    # Revenue Per Click: Total Revenue ÷ Total Clicks
+    ('revenuePerClick', 'revenue', 'websiteClicks', 1),
+    # Customer Acquisition Cost (CAC): Ad Spend ÷ New Customers
+    ('customerAcquisitionCost', 'adSpend', 'newCustomers', 1),
+    # Cost Per Acquisition (CPA): Ad Spend ÷ Conversions (postSaves as Conversions)
+    ('costPerAcquisition', 'adSpend', 'postSaves', 1),
+    # Bid Efficiency: Actual CPC ÷ Max Bid × 100
+    ('bidEfficiency', 'costPerClick', 'maxBid', 100),
+    # Audience Saturation: Reach ÷ Audience Size × 100 (followers as audience size)
+    ('audienceSaturation', 'reach', 'totalFollowers', 100),
+    # Daily Budget Utilization: Daily Spend ÷ Daily Budget × 100 (adSpend as Daily Spend)
+    ('dailyBudgetUtilization', 'adSpend', 'dailyBudget', 100),
+    # Optimization Score: (Quality Ranking + Engagement Ranking + Conversion Ranking) ÷ 3
+    ('optimizationScore', ('qualityRanking', 'engagementRanking', 'conversionRanking'), 3, 1),
+    # Learning Efficiency: Conversions During Learning ÷ Total Conversions × 100
+    ('learningEfficiency', 'conversionsDuringLearning', 'postSaves', 100),
+    # Incremental ROAS: (Campaign Revenue - Baseline Revenue) ÷ Ad Spend
+    ('incrementalROAS', ('campaignRevenue', '-baselineRevenue'), 'adSpend', 1),
+    # Video Completion Rate: Completed Views ÷ Total Video Views × 100 (tenSecondViews as Completed Views)
+    ('videoCompletionRate', 'tenSecondViews', 'videoViews', 100),
+    # Video Engagement Rate: Video Engagements ÷ Video Views × 100
+    # (likes + comments + shares until video-specific engagements are available)
+    ('videoEngagementRate', ('likes', 'comments', 'shares'), 'videoViews', 100),
+    # Video CTR: Video Clicks ÷ Video Impressions × 100 (websiteClicks and impressions as placeholders)
+    ('videoCTR', 'websiteClicks', 'impressions', 100),
+    # Average Percentage Viewed: Average Watch Time ÷ Video Duration × 100
+    ('averagePercentageViewed', 'averageWatchTime', 'videoDuration', 100),
+]
+
+
+def _operand(columns, operand, size):
+    if isinstance(operand, (int, float)):
+        return np.full(size, float(operand))
+    if isinstance(operand, str):
+        operand = (operand,)
+    total = np.zeros(size)
+    for term in operand:
+        if term.startswith('-'):
+            total -= columns[term[1:]]
+        else:
+            total += columns[term]
+    return total
+
+
+def compute_derived_metrics(columns):
+    """Evaluate DERIVED_METRICS over equal-length columns in one vectorized pass.
+
+    `columns` maps input metric names to sequences (one entry per post, day,
+    page, ...). Returns a dict of float arrays holding the inputs, the
+    placeholder inputs and every derived metric.
+    """
+    arrays = {name: np.asarray(values, dtype=float) for name, values in columns.items()}
+    size = len(next(iter(arrays.values()))) if arrays else 0
+    for name, value in PLACEHOLDER_INPUTS.items():
+        if name not in arrays:
+            arrays[name] = np.full(size, float(value))
+    for name, numerator, denominator, scale in DERIVED_METRICS:
+        top = _operand(arrays, numerator, size)
+        if denominator is None:
+            arrays[name] = top
+            continue
+        bottom = _operand(arrays, denominator, size)
+        ratio = np.zeros(size)
+        np.divide(top, bottom, out=ratio, where=bottom > 0)
+        arrays[name] = np.round(ratio * scale, 2)
+    return arrays
+
+
+def _scalar_operand(values, operand):
+    if isinstance(operand, str):
+        return values[operand]
+    if isinstance(operand, tuple):
+        return sum(-values[term[1:]] if term.startswith('-') else values[term] for term in operand)
+    return operand
+
+
+def add_derived_metrics(metrics, total_followers):
+    """Add every derived metric to one aggregate metrics dict.
+
+    Evaluates the same DERIVED_METRICS table in plain Python: for a single row
+    that is far cheaper than building arrays (compute_derived_metrics is for
+    many posts, days or pages at once).
+    """
+    values = {**PLACEHOLDER_INPUTS, **metrics, 'totalFollowers': total_followers}
+    for name, numerator, denominator, scale in DERIVED_METRICS:
+        top = _scalar_operand(values, numerator)
+        if denominator is None:
+            value = top
+        else:
+            bottom = _scalar_operand(values, denominator)
+            value = round(top / bottom * scale, 2) if bottom > 0 else 0
+        values[name] = metrics[name] = value
+    return metrics
@@ -0,0 +1,193 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from graph import GraphClient, GraphError, first_error
+from post_store import POST_METRIC_COLUMNS, parse_graph_time
+from telemetry import span
+
+POST_ENGAGEMENT_FIELDS = "likes.summary(true),comments.summary(true),shares"
+POST_INSIGHT_METRICS = "post_impressions,post_impressions_unique,post_impressions_organic,post_impressions_paid"
+VIDEO_INSIGHT_METRICS = "total_video_views,total_video_10s_views,average_watch_time,video_retention"
+# Engagement and insights in one lookup per post, via field expansion
+POST_FIELDS = f"{POST_ENGAGEMENT_FIELDS},insights.metric({POST_INSIGHT_METRICS})"
+
+# Graph insight name -> dashboard metric key
+POST_INSIGHT_KEYS = {
+    "post_impressions_unique": "reach",
+    "post_impressions": "impressions",
+    "post_impressions_organic": "organicImpressions",
+    "post_impressions_paid": "paidImpressions",
+}
+VIDEO_INSIGHT_KEYS = {
+    "total_video_views": "videoViews",
+    "total_video_10s_views": "tenSecondViews",
+    "average_watch_time": "averageWatchTime",
+    "video_retention": "videoRetentionRate",
+}
+
+
+def _add_insights(metrics, insights, keys):
+    for item in insights.get("data", []):
+        key = keys.get(item["name"])
+        if key:
+            metrics[key] += item["values"][0]["value"]
+
+
+def add_post_engagement(metrics, post):
+    metrics['likes'] += post.get("likes", {}).get("summary", {}).get("total_count", 0)
+    metrics['comments'] += post.get("comments", {}).get("summary", {}).get("total_count", 0)
+    metrics['shares'] += post.get("shares", {}).get("count", 0)
+
+
+def add_post_insights(metrics, post):
+    """Fold the insights expanded on a post (see POST_FIELDS) into the running totals."""
+    _add_insights(metrics, post.get("insights", {}), POST_INSIGHT_KEYS)
+
+
+# Graph edge listing each kind of object stored per page
+EDGES = {'post': 'posts', 'video': 'videos'}
+# Fields read while listing an edge; the text and link are only kept for the per-post table
+LIST_FIELDS = {
+    'post': "id,created_time,message,permalink_url",
+    'video': "id,created_time,description,permalink_url",
+}
+# Timing span of each step of walking an edge: (listing, per-object lookups)
+EDGE_STAGES = {
+    'post': ('post_listing', 'post_engagement_insights'),
+    'video': ('video_listing', 'video_insights'),
+}
+
+
+def new_metrics():
+    """Zeroed dashboard metrics; the snapshot format shared by every platform."""
+    # Organic metrics to fetch (from config modal)
+    return {
+        'reach': 0,
+        'impressions': 0,
+        'organicImpressions': 0,
+        'paidImpressions': 0,
+        'likes': 0,
+        'comments': 0,
+        'shares': 0,
+        'videoViews': 0,
+        'tenSecondViews': 0,
+        'averageWatchTime': 0,
+        'videoRetentionRate': 0,
+        'websiteClicks': 0,
+        'ctaClicks': 0,
+        'postSaves': 0,
+        'adSpend': 0,
+        'adRelevanceScore': 0,
+    }
+
+
+def new_post_row(created_time):
+    row = {key: 0 for key in POST_METRIC_COLUMNS}
+    row['created_time'] = parse_graph_time(created_time)
+    return row
+
+
+def _fold_edge(metrics, client, store, page_id, kind, params, posts=None):
+    """Walk every page of the posts or videos edge, folding each page into `metrics`.
+
+    When `posts` is a list, every object's row is appended to it as well.
+    """
+    listing_stage, lookup_stage = EDGE_STAGES[kind]
+    pages = client.paginate(f"{page_id}/{EDGES[kind]}", fields=LIST_FIELDS[kind], **params)
+    while True:
+        with span(listing_stage):
+            objects = next(pages, None)
+        if objects is None:
+            break
+        # With a store, only objects that are new or still hot need fetching
+        if store is not None:
+            object_ids = store.stale_ids(page_id, kind, objects)
+        else:
+            object_ids = [obj['id'] for obj in objects]
+
+        # One batched sub-request per post (engagement + insights) or per video
+        if kind == 'post':
+            calls = [(object_id, {"fields": POST_FIELDS}) for object_id in object_ids]
+        else:
+            calls = [(f"{object_id}/insights", {"metric": VIDEO_INSIGHT_METRICS}) for object_id in object_ids]
+        with span(lookup_stage):
+            results = client.batch(calls) if calls else []
+
+        created = {obj['id']: obj.get('created_time') for obj in objects}
+        rows = {}
+        for object_id, result in zip(object_ids, results):
+            # A failed lookup is not a row of zeros: its stored row is kept (and
+            # stays stale, so the next refresh asks again)
+            if isinstance(result, GraphError):
+                continue
+            row = new_post_row(created[object_id])
+            if kind == 'post':
+                add_post_engagement(row, result)
+                add_post_insights(row, result)
+            else:
+                _add_insights(row, result, VIDEO_INSIGHT_KEYS)
+            rows[object_id] = row
+
+        if store is not None:
+            # Re-aggregate this page of objects from the stored rows
+            store.upsert(page_id, kind, rows)
+        # The refresh fails, so the last good snapshot stays published, but the
+        # objects that were fetched are kept for the next attempt
+        error = first_error(results)
+        if error is not None:
+            raise error
+        if store is not None:
+            rows = store.rows(page_id, kind, [obj['id'] for obj in objects])
+        for row in rows.values():
+            for key in POST_METRIC_COLUMNS:
+                metrics[key] += row[key]
+
+        if posts is not None:
+            for obj in objects:
+                row = rows.get(obj['id'])
+                if row is not None:
+                    posts.append({
+                        **row,
+                        'id': obj['id'],
+                        'kind': kind,
+                        'text': obj.get('message') or obj.get('description'),
+                        'permalink_url': obj.get('permalink_url'),
+                    })
+
+
+# --- Fetch all organic metrics for the dashboard ---
+def fetch_facebook_organic_metrics(page_id, access_token, client=None, store=None,
+                                   since=None, until=None, page_size=None, posts=None):
+    """Aggregate metrics over every post and video of the page.
+
+    `since`/`until` bound the posts and videos by creation time (anything the
+    Graph API accepts: a date, a datetime or a unix timestamp) and `page_size`
+    sets how many objects are listed per Graph page. Pass a list as `posts` to
+    also get the per-post rows the totals are summed from.
+    """
+    metrics = new_metrics()
+    params = {key: value for key, value in (('since', since), ('until', until), ('limit', page_size))
+              if value is not None}
+    owns_client = client is None
+    if owns_client:
+        client = GraphClient(access_token)
+    try:
+        # Walk posts (engagement and impressions) and videos (video insights) side by side
+        totals = {kind: {key: 0 for key in POST_METRIC_COLUMNS} for kind in EDGES}
+        with ThreadPoolExecutor(max_workers=len(EDGES)) as edges:
+            for future in [edges.submit(_fold_edge, totals[kind], client, store, page_id, kind, params, posts)
+                           for kind in EDGES]:
+                future.result()
+        for kind_totals in totals.values():
+            for key in POST_METRIC_COLUMNS:
+                metrics[key] += kind_totals[key]
+    finally:
+        if owns_client:
+            client.close()
+    # Fetch page-level metrics (website clicks, cta clicks, post saves, ad spend, ad relevance score)
+    # These may require different endpoints or permissions; placeholders below:
+    # metrics['websiteClicks'] = ...
+    # metrics['ctaClicks'] = ...
+    # metrics['postSaves'] = ...
+    # metrics['adSpend'] = ...
+    # metrics['adRelevanceScore'] = ...
+    return metrics
@@ -0,0 +1,630 @@
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from telemetry import GRAPH_CACHE, GRAPH_REQUESTS, GRAPH_RETRIES, GRAPH_SECONDS
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Base URL of the Graph API (override to point at a local mock server)
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.facebook.com/v18.0")
+
+# Maximum number of Graph API requests in flight at once
+GRAPH_MAX_WORKERS = int(os.getenv("GRAPH_MAX_WORKERS", "8"))
+
+# The Graph API accepts at most 50 sub-requests per batch call
+GRAPH_BATCH_LIMIT = 50
+
+# Default number of objects requested per page when walking an edge
+GRAPH_PAGE_SIZE = int(os.getenv("GRAPH_PAGE_SIZE", "100"))
+
+# HTTP requests per second allowed per access token (0 disables the limit), and
+# how many requests a token may burst above that rate
+GRAPH_TOKEN_RATE = float(os.getenv("GRAPH_TOKEN_RATE", "10"))
+GRAPH_TOKEN_BURST = int(os.getenv("GRAPH_TOKEN_BURST", "20"))
+
+# Seconds to wait for a connection and for a response
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "5"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "30"))
+
+# Transient failures are retried up to GRAPH_MAX_RETRIES times, sleeping a random
+# time of up to GRAPH_BACKOFF_BASE * 2**attempt seconds (capped at GRAPH_BACKOFF_MAX)
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "4"))
+GRAPH_BACKOFF_BASE = float(os.getenv("GRAPH_BACKOFF_BASE", "0.5"))
+GRAPH_BACKOFF_MAX = float(os.getenv("GRAPH_BACKOFF_MAX", "30"))
+
+# Usage reported in the X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage
+# headers (percent of the quota): above GRAPH_USAGE_SLOWDOWN the request rate and
+# concurrency shrink linearly, down to a tenth at 100%; at GRAPH_USAGE_PAUSE requests
+# stop for the time Facebook says access is regained (or GRAPH_USAGE_PAUSE_SECONDS)
+GRAPH_USAGE_SLOWDOWN = float(os.getenv("GRAPH_USAGE_SLOWDOWN", "75"))
+GRAPH_USAGE_PAUSE = float(os.getenv("GRAPH_USAGE_PAUSE", "95"))
+GRAPH_USAGE_PAUSE_SECONDS = float(os.getenv("GRAPH_USAGE_PAUSE_SECONDS", "60"))
+# While a token is paused for longer than this many seconds, its calls fail right
+# away instead of waiting (and holding a worker thread) until access is regained
+GRAPH_MAX_PAUSE = float(os.getenv("GRAPH_MAX_PAUSE", "300"))
+
+# Seconds a successful GET response is reused (0 disables caching), overridden per
+# endpoint by GRAPH_CACHE_TTLS, e.g. "{id}/insights=300,{id}/posts=30", and the
+# number of responses kept before the least recently used are evicted
+GRAPH_CACHE_TTL = float(os.getenv("GRAPH_CACHE_TTL", "60"))
+GRAPH_CACHE_TTLS = os.getenv("GRAPH_CACHE_TTLS", "")
+GRAPH_CACHE_SIZE = int(os.getenv("GRAPH_CACHE_SIZE", "10000"))
+
+# Graph error codes worth retrying: temporary errors and the rate limits
+GRAPH_RATE_LIMIT_CODES = {4, 17, 32, 613, *range(80001, 80015)}
+GRAPH_TRANSIENT_CODES = {1, 2, 341, *GRAPH_RATE_LIMIT_CODES}
+
+
+class GraphError(Exception):
+    """A Graph API call that failed for good (after any retries)."""
+
+    def __init__(self, message, code=None, status=None, endpoint=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.endpoint = endpoint
+
+
+class TokenBucket:
+    """Thread-safe token bucket: acquire() blocks until a request may be sent."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        # Fraction of `rate` currently allowed (lowered while usage is high)
+        self.scale = 1.0
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                rate = self.rate * self.scale
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / rate
+            time.sleep(wait)
+
+
+def parse_usage(headers):
+    """Highest quota usage (percent) in a response's usage headers, and the seconds
+    until access is regained (0 when not throttled). Usage is None without headers."""
+    usage, regain = None, 0.0
+    entries = []
+    for name in ("X-App-Usage", "X-Page-Usage"):
+        if headers.get(name):
+            try:
+                entries.append(json.loads(headers[name]))
+            except ValueError:
+                pass
+    if headers.get("X-Business-Use-Case-Usage"):
+        try:
+            for business in json.loads(headers["X-Business-Use-Case-Usage"]).values():
+                entries.extend(business)
+        except (ValueError, AttributeError):
+            pass
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        for key in ("call_count", "total_time", "total_cputime"):
+            value = entry.get(key)
+            if isinstance(value, (int, float)):
+                usage = max(usage or 0, value)
+        regain = max(regain, 60 * float(entry.get("estimated_time_to_regain_access") or 0))
+    return usage, regain
+
+
+class GraphThrottle:
+    """Per-token pacing that follows the usage Facebook reports.
+
+    Combines the token bucket with a cap on requests in flight; both shrink as the
+    reported usage climbs past GRAPH_USAGE_SLOWDOWN, and every request waits while
+    the token is paused after hitting (or nearly hitting) its quota.
+    """
+
+    def __init__(self, rate, burst, max_in_flight):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_in_flight = max(1, max_in_flight)
+        self.usage = 0.0
+        self.paused_until = 0.0
+        self._in_flight = 0
+        self._cond = threading.Condition()
+
+    @property
+    def scale(self):
+        if self.usage <= GRAPH_USAGE_SLOWDOWN:
+            return 1.0
+        over = (self.usage - GRAPH_USAGE_SLOWDOWN) / max(1e-9, 100 - GRAPH_USAGE_SLOWDOWN)
+        return max(0.1, 1 - 0.9 * over)
+
+    def acquire(self, endpoint=None):
+        """Wait for a request slot; raises GraphError while the token is paused beyond GRAPH_MAX_PAUSE."""
+        with self._cond:
+            while True:
+                wait = self.paused_until - time.monotonic()
+                if wait > GRAPH_MAX_PAUSE:
+                    raise GraphError(f"Graph API {endpoint}: rate limited, access regained in {wait:.0f}s",
+                                     endpoint=endpoint)
+                limit = max(1, int(self.max_in_flight * self.scale))
+                if wait <= 0 and self._in_flight < limit:
+                    self._in_flight += 1
+                    break
+                self._cond.wait(timeout=wait if wait > 0 else None)
+        self.bucket.acquire()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    def update(self, usage, regain=0.0):
+        """Record the usage of the latest response; pause when the quota is (nearly) spent."""
+        with self._cond:
+            self.usage = usage
+            self.bucket.scale = self.scale
+            if regain or usage >= GRAPH_USAGE_PAUSE:
+                self.pause(regain or GRAPH_USAGE_PAUSE_SECONDS)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+# One throttle per access token, shared by every client using that token
+_throttles = {}
+_throttles_lock = threading.Lock()
+
+
+def token_throttle(access_token):
+    with _throttles_lock:
+        throttle = _throttles.get(access_token)
+        if throttle is None:
+            throttle = _throttles[access_token] = GraphThrottle(
+                GRAPH_TOKEN_RATE, GRAPH_TOKEN_BURST, GRAPH_MAX_WORKERS)
+        return throttle
+
+
+_ID_SEGMENT = re.compile(r"^\d+(_\d+)?$")
+_ACCESS_TOKEN = re.compile(r"access_token=[^&\s'\"]+")
+
+
+def endpoint_name(path):
+    """Graph path (or URL) with object IDs replaced, e.g. 123/posts -> {id}/posts.
+
+    Paths start with the node the call is about, so the first segment is always
+    an ID (except for "me"), which keeps one counter per kind of call.
+    """
+    segments = [s for s in urlparse(path).path.split("/") if s]
+    if segments and re.match(r"^v\d+\.\d+$", segments[0]):
+        segments = segments[1:]
+    if not segments:
+        return "batch"
+    head = segments[0] if segments[0] == "me" else "{id}"
+    return "/".join([head, *("{id}" if _ID_SEGMENT.match(s) else s for s in segments[1:])])
+
+
+class GraphStats:
+    """Thread-safe per-endpoint request, error, retry and latency counters.
+
+    Batch sub-requests are counted under their own endpoint, without latency
+    (the enclosing batch request carries it). Every record is mirrored to the
+    Prometheus graph_* metrics.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _stats(self, endpoint):
+        stats = self._endpoints.get(endpoint)
+        if stats is None:
+            stats = self._endpoints[endpoint] = {
+                "requests": 0, "errors": 0, "retries": 0, "cache_hits": 0, "cache_misses": 0,
+                "timed": 0, "latency_total": 0.0, "latency_max": 0.0,
+            }
+        return stats
+
+    def record(self, endpoint, latency=None, error=False):
+        with self._lock:
+            stats = self._stats(endpoint)
+            stats["requests"] += 1
+            stats["errors"] += bool(error)
+            if latency is not None:
+                stats["timed"] += 1
+                stats["latency_total"] += latency
+                stats["latency_max"] = max(stats["latency_max"], latency)
+        GRAPH_REQUESTS.labels(endpoint, "error" if error else "ok").inc()
+        if latency is not None:
+            GRAPH_SECONDS.labels(endpoint).observe(latency)
+
+    def record_retry(self, endpoint):
+        with self._lock:
+            self._stats(endpoint)["retries"] += 1
+        GRAPH_RETRIES.labels(endpoint).inc()
+
+    def record_cache(self, endpoint, hit):
+        with self._lock:
+            self._stats(endpoint)["cache_hits" if hit else "cache_misses"] += 1
+        GRAPH_CACHE.labels(endpoint, "hit" if hit else "miss").inc()
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: dict(stats) for endpoint, stats in self._endpoints.items()}
+
+
+# Counters of every Graph call made by this process
+graph_stats = GraphStats()
+
+
+def parse_ttls(value):
+    """Per-endpoint cache TTLs from "endpoint=seconds,..." (see GRAPH_CACHE_TTLS)."""
+    ttls = {}
+    for item in value.split(","):
+        endpoint, _, seconds = item.partition("=")
+        if endpoint.strip() and seconds.strip():
+            ttls[endpoint.strip()] = float(seconds)
+    return ttls
+
+
+class _Flight:
+    """A cache miss being fetched; identical requests wait for it instead of sending their own."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class GraphCache:
+    """Thread-safe LRU cache of Graph GET responses with per-endpoint TTLs.
+
+    Concurrent misses on the same key are coalesced: one caller fetches while
+    the others wait for its response (or its error). Failed calls are not
+    cached. Cached bodies are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_entries=None, ttl=None, ttls=None):
+        self.max_entries = GRAPH_CACHE_SIZE if max_entries is None else max_entries
+        self.ttl = GRAPH_CACHE_TTL if ttl is None else ttl
+        self.ttls = parse_ttls(GRAPH_CACHE_TTLS) if ttls is None else ttls
+        self._entries = OrderedDict()  # key -> (expires, body), least recently used first
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.ttl)
+
+    def _lookup(self, key):
+        # Caller holds the lock
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key, endpoint):
+        """The fresh cached body for `key`, or None."""
+        with self._lock:
+            entry = self._lookup(key)
+        graph_stats.record_cache(endpoint, entry is not None)
+        return entry and entry[1]
+
+    def put(self, key, endpoint, body):
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def fetch(self, key, endpoint, load):
+        """The cached body for `key`, or load() it, sharing one load among concurrent callers."""
+        if self.ttl_for(endpoint) <= 0:
+            return load()
+        with self._lock:
+            entry = self._lookup(key)
+            flight = None if entry is not None else self._flights.get(key)
+            leader = entry is None and flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        # Waiting on another caller's request costs no Graph call either
+        graph_stats.record_cache(endpoint, not leader)
+        if entry is not None:
+            return entry[1]
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = load()
+            self.put(key, endpoint, flight.value)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# Responses shared by every GraphClient of this process
+graph_cache = GraphCache()
+
+
+def _graph_error(status, body):
+    """The (code, message, transient) of a failed response, or None when it succeeded."""
+    error = body.get("error") if isinstance(body, dict) else None
+    if error is None and status < 400:
+        return None
+    error = error if isinstance(error, dict) else {}
+    code = error.get("code")
+    transient = bool(error.get("is_transient")) or code in GRAPH_TRANSIENT_CODES or status == 429 or status >= 500
+    return code, error.get("message") or f"HTTP {status}", transient
+
+
+def first_error(results):
+    """The first GraphError among GraphClient.batch() results, or None when every call succeeded."""
+    return next((result for result in results if isinstance(result, GraphError)), None)
+
+
+def backoff(attempt):
+    """Full-jitter exponential backoff delay for the given retry attempt."""
+    return random.uniform(0, min(GRAPH_BACKOFF_MAX, GRAPH_BACKOFF_BASE * 2 ** attempt))
+
+
+class GraphClient:
+    """Graph API client sharing one pooled HTTP session across worker threads.
+
+    Requests are paced by the token's GraphThrottle, time out after
+    GRAPH_CONNECT_TIMEOUT/GRAPH_READ_TIMEOUT, and transient failures (network
+    errors, 5xx, rate limits) are retried with jittered exponential backoff. Calls
+    that still fail raise GraphError instead of returning the error body.
+
+    GETs (batched or not) go through `cache` (the shared graph_cache by default,
+    None to disable), so a call answered within its TTL is not sent again.
+    """
+
+    def __init__(self, access_token, base_url=None, max_workers=None, max_retries=None, cache=graph_cache):
+        self.access_token = access_token
+        self.base_url = (base_url or GRAPH_API_URL).rstrip('/')
+        self.max_workers = max(1, max_workers or GRAPH_MAX_WORKERS)
+        self.max_retries = GRAPH_MAX_RETRIES if max_retries is None else max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.request_count = 0
+        self.retry_count = 0
+        self._throttle = token_throttle(access_token)
+        self.cache = cache
+        # Responses are cached per token: pages (and permissions) differ between tokens
+        self._cache_scope = hashlib.sha1(str(access_token).encode("utf-8")).hexdigest()[:16]
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def get(self, path, **params):
+        params['access_token'] = self.access_token
+        return self._get_url(f"{self.base_url}/{path.lstrip('/')}", params)
+
+    def _get_url(self, url, params=None):
+        endpoint = endpoint_name(url)
+        if self.cache is None:
+            return self._request("GET", url, endpoint, params=params)
+        return self.cache.fetch(self._cache_key(url, params), endpoint,
+                                lambda: self._request("GET", url, endpoint, params=params))
+
+    def _cache_key(self, url, params=None):
+        """The token scope, path and sorted query of a GET, without the access token."""
+        parsed = urlparse(url)
+        query = [*parse_qsl(parsed.query), *(params or {}).items()]
+        return (self._cache_scope, parsed.path.rstrip("/"),
+                tuple(sorted((k, str(v)) for k, v in query if k != "access_token")))
+
+    def _send(self, method, url, endpoint, **kwargs):
+        """One HTTP attempt: returns (body, error) where error is (code, message, transient) or None."""
+        self._throttle.acquire(endpoint)
+        with self._lock:
+            self.request_count += 1
+        started = time.monotonic()
+        try:
+            response = self.session.request(
+                method, url, timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            graph_stats.record(endpoint, time.monotonic() - started, error=True)
+            # requests puts the URL, access token included, into its messages
+            message = _ACCESS_TOKEN.sub("access_token=<redacted>", str(e))
+            return None, (None, f"{type(e).__name__}: {message}", True)
+        finally:
+            self._throttle.release()
+        latency = time.monotonic() - started
+        usage, regain = parse_usage(response.headers)
+        if usage is not None:
+            self._throttle.update(usage, regain)
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        error = _graph_error(response.status_code, body)
+        graph_stats.record(endpoint, latency, error=error is not None)
+        if error is not None and error[0] in GRAPH_RATE_LIMIT_CODES:
+            # Every request on this token would hit the same limit: hold them all
+            self._throttle.pause(regain or backoff(self.max_retries))
+            if regain > GRAPH_MAX_PAUSE:
+                error = (error[0], error[1], False)
+        return body, error
+
+    def _request(self, method, url, endpoint, **kwargs):
+        attempt = 0
+        while True:
+            body, error = self._send(method, url, endpoint, **kwargs)
+            if error is None:
+                return body
+            code, message, transient = error
+            if not transient or attempt >= self.max_retries:
+                raise GraphError(f"Graph API {endpoint}: {message}", code=code, endpoint=endpoint)
+            with self._lock:
+                self.retry_count += 1
+            graph_stats.record_retry(endpoint)
+            time.sleep(backoff(attempt))
+            attempt += 1
+
+    def paginate(self, path, **params):
+        """Yield each page of an edge's `data`, following `paging.next` until exhausted.
+
+        Only one page is held at a time, so callers can fold arbitrarily long
+        edges into running totals in constant memory.
+        """
+        params.setdefault('limit', GRAPH_PAGE_SIZE)
+        page = self.get(path, **params)
+        while True:
+            data = page.get("data", [])
+            if data:
+                yield data
+            next_url = page.get("paging", {}).get("next")
+            if not data or not next_url:
+                return
+            # `next` already carries the cursor, the filters and the access token
+            page = self._get_url(next_url)
+
+    def get_many(self, calls):
+        """Run (path, params) GETs concurrently, returning responses in input order."""
+        return self._map(lambda call: self.get(call[0], **call[1]), list(calls))
+
+    def batch(self, calls):
+        """Send (path, params) GETs as Graph batch requests of up to 50 sub-requests each.
+
+        Returns one parsed body per call in input order. Sub-requests that fail
+        transiently are resent in a later batch; those that still fail (or fail
+        for good) come back as a GraphError in place of the body, for the caller
+        to raise (see first_error) or handle. Calls answered by the cache, and
+        repeats of a call within `calls`, are not sent.
+        """
+        calls = list(calls)
+        results = [None] * len(calls)
+        keys = [self._cache_key(f"{self.base_url}/{path.lstrip('/')}", params) for path, params in calls]
+        unsent = {}  # key -> index of the first call sending it
+        for i, (key, (path, _)) in enumerate(zip(keys, calls)):
+            if key in unsent:
+                continue
+            cached = None
+            if self.cache is not None and self.cache.ttl_for(endpoint_name(path)) > 0:
+                cached = self.cache.get(key, endpoint_name(path))
+            if cached is not None:
+                results[i] = cached
+            else:
+                unsent[key] = i
+        sending = [calls[i] for i in unsent.values()]
+        chunks = [sending[i:i + GRAPH_BATCH_LIMIT] for i in range(0, len(sending), GRAPH_BATCH_LIMIT)]
+        fetched = dict(zip(unsent, (body for chunk in self._map(self._post_batch, chunks) for body in chunk)))
+        for i, key in enumerate(keys):
+            if results[i] is None:
+                results[i] = fetched[key]
+        return results
+
+    def _post_batch(self, calls):
+        relative_urls = [
+            f"{path.lstrip('/')}?{urlencode(params)}" if params else path.lstrip('/')
+            for path, params in calls
+        ]
+        results = [None] * len(calls)
+        errors = {}  # index -> (code, message) of the last failure
+        pending = list(range(len(calls)))
+        attempt = 0
+        while True:
+            batch = [{"method": "GET", "relative_url": relative_urls[i]} for i in pending]
+            response = self._request(
+                "POST", self.base_url, "batch",
+                data={"access_token": self.access_token, "batch": json.dumps(batch)},
+            )
+            if not isinstance(response, list):
+                raise GraphError("Graph API batch: unexpected response", endpoint="batch")
+            retry = []
+            for i, item in zip(pending, response):
+                endpoint = endpoint_name(relative_urls[i])
+                # Facebook answers null for sub-requests it did not finish in time
+                if not item:
+                    error = (None, "no response", True)
+                    body = None
+                else:
+                    try:
+                        body = json.loads(item.get("body") or "null")
+                    except ValueError:
+                        body = None
+                    error = _graph_error(item.get("code", 500), body)
+                graph_stats.record(endpoint, error=error is not None)
+                if error is None:
+                    results[i] = body
+                    errors.pop(i, None)
+                    if self.cache is not None:
+                        self.cache.put(self._cache_key(f"{self.base_url}/{relative_urls[i]}"), endpoint, body)
+                    continue
+                errors[i] = error[:2]
+                if error[2]:
+                    retry.append(i)
+                    if error[0] in GRAPH_RATE_LIMIT_CODES:
+                        self._throttle.pause(backoff(self.max_retries))
+            if not retry or attempt >= self.max_retries:
+                for i, (code, message) in errors.items():
+                    endpoint = endpoint_name(relative_urls[i])
+                    results[i] = GraphError(f"Graph API {endpoint}: {message}", code=code, endpoint=endpoint)
+                return results
+            with self._lock:
+                self.retry_count += 1
+            graph_stats.record_retry("batch")
+            time.sleep(backoff(attempt))
+            pending = retry
+            attempt += 1
+
+    def _map(self, fn, items):
+        if self.max_workers == 1 or len(items) < 2:
+            return [fn(item) for item in items]
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="graph")
+            executor = self._executor
+        return list(executor.map(fn, items))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
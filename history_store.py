@@ -0,0 +1,229 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_STORE_PATH = os.getenv("HISTORY_STORE_PATH", os.path.join(BASE_DIR, "metrics_history.db"))
+
+DAY = 86400
+
+# Downsampling buckets in seconds; weeks start on Monday (1970-01-05 was one)
+RESOLUTIONS = {
+    "hour": (3600, 0),
+    "day": (DAY, 0),
+    "week": (7 * DAY, 4 * DAY),
+}
+AGGREGATES = ("mean", "min", "max", "last")
+
+# Resolution of queries that don't ask for one, by the length of the range: the
+# finest that keeps responses to about a thousand points per metric (a year of
+# raw 15-minute snapshots is 35,000 points and takes ~0.5s just to encode)
+DEFAULT_RESOLUTIONS = [
+    (2 * DAY, None),
+    (31 * DAY, "hour"),
+    (3 * 365 * DAY, "day"),
+]
+
+
+def numeric_metrics(metrics, prefix=""):
+    """The plain numbers of a metrics snapshot (insights and other text are not tracked).
+
+    Nested platform snapshots are flattened, e.g. instagram.reach.
+    """
+    numbers = {}
+    for name, value in metrics.items():
+        if isinstance(value, dict):
+            numbers.update(numeric_metrics(value, f"{prefix}{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            numbers[prefix + name] = float(value)
+    return numbers
+
+
+def _decode(row):
+    names, ts_blob, values_blob = row
+    names = json.loads(names)
+    timestamps = np.frombuffer(ts_blob, dtype=np.float64)
+    values = np.frombuffer(values_blob, dtype=np.float64).reshape(len(names), len(timestamps))
+    return names, timestamps, values
+
+
+def _encode(names, timestamps, values):
+    return (
+        json.dumps(names),
+        np.ascontiguousarray(timestamps, dtype=np.float64).tobytes(),
+        np.ascontiguousarray(values, dtype=np.float64).tobytes(),
+    )
+
+
+def _align(names, values, wanted):
+    """Rows of `values` reordered to `wanted`, NaN for metrics the chunk doesn't have."""
+    if names == wanted:
+        return values
+    index = {name: i for i, name in enumerate(names)}
+    rows = [index.get(name, -1) for name in wanted]
+    if -1 not in rows:
+        return values[rows]
+    aligned = np.full((len(wanted), values.shape[1]), np.nan)
+    for i, row in enumerate(rows):
+        if row >= 0:
+            aligned[i] = values[row]
+    return aligned
+
+
+def default_resolution(start, end):
+    """Resolution for a range query without one: None (raw) for short ranges, then hour, day, week."""
+    for span, resolution in DEFAULT_RESOLUTIONS:
+        if end - start <= span:
+            return resolution
+    return "week"
+
+
+def downsample(timestamps, values, resolution, agg="mean"):
+    """Aggregate sorted snapshots into hour/day/week buckets; returns (bucket starts, values)."""
+    if not len(timestamps):
+        return timestamps, values
+    size, offset = RESOLUTIONS[resolution]
+    buckets = np.floor((timestamps - offset) / size) * size + offset
+    starts = np.flatnonzero(np.r_[True, np.diff(buckets) != 0])
+    if agg == "min":
+        result = np.fmin.reduceat(values, starts, axis=1)
+    elif agg == "max":
+        result = np.fmax.reduceat(values, starts, axis=1)
+    elif agg == "last":
+        result = values[:, np.r_[starts[1:], len(timestamps)] - 1]
+    else:
+        missing = np.isnan(values)
+        sums = np.add.reduceat(np.where(missing, 0.0, values), starts, axis=1)
+        counts = np.add.reduceat(~missing, starts, axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = sums / counts
+    return buckets[starts], result
+
+
+def series_json(timestamps, series):
+    """JSON-ready form of a series() result; NaN (metric not recorded then) becomes null."""
+    def clean(values):
+        if not np.isnan(values).any():
+            return values.tolist()
+        return [v if v == v else None for v in values.tolist()]
+    return {"timestamps": [int(t) for t in timestamps.tolist()], "series": {name: clean(v) for name, v in series.items()}}
+
+
+class MetricHistoryStore:
+    """Columnar SQLite time series of metric snapshots.
+
+    Each row holds one page-day: the snapshot timestamps and one packed float64
+    column per metric. Range queries read one row per day from the (page_id, day)
+    primary key and slice the columns with NumPy.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or HISTORY_STORE_PATH
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metric_history (
+                    page_id TEXT NOT NULL,
+                    day INTEGER NOT NULL,
+                    names TEXT NOT NULL,
+                    timestamps BLOB NOT NULL,
+                    vals BLOB NOT NULL,
+                    PRIMARY KEY (page_id, day)
+                ) WITHOUT ROWID
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def append(self, page_id, metrics, ts=None):
+        """Record one metrics snapshot of a page."""
+        numbers = numeric_metrics(metrics)
+        ts = time.time() if ts is None else ts
+        self.extend(page_id, [ts], {name: [value] for name, value in numbers.items()})
+
+    def extend(self, page_id, timestamps, columns):
+        """Record many snapshots at once: timestamps plus {metric: values} of equal length."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        names = sorted(columns)
+        values = np.array([columns[name] for name in names], dtype=np.float64).reshape(len(names), len(timestamps))
+        days = (timestamps // DAY).astype(np.int64)
+        with self._lock:
+            conn = self._connect()
+            for day in np.unique(days):
+                selected = days == day
+                self._merge(conn, str(page_id), int(day), names, timestamps[selected], values[:, selected])
+            conn.commit()
+
+    def _merge(self, conn, page_id, day, names, timestamps, values):
+        row = conn.execute(
+            "SELECT names, timestamps, vals FROM metric_history WHERE page_id = ? AND day = ?", (page_id, day)
+        ).fetchone()
+        if row is not None:
+            old_names, old_timestamps, old_values = _decode(row)
+            merged = old_names + [name for name in names if name not in old_names]
+            timestamps = np.concatenate([old_timestamps, timestamps])
+            values = np.concatenate([_align(old_names, old_values, merged), _align(names, values, merged)], axis=1)
+            names = merged
+            # Keep the day sorted even when snapshots arrive out of order (backfills)
+            order = np.argsort(timestamps, kind="stable")
+            timestamps, values = timestamps[order], values[:, order]
+        conn.execute(
+            "INSERT OR REPLACE INTO metric_history (page_id, day, names, timestamps, vals) VALUES (?, ?, ?, ?, ?)",
+            (page_id, day, *_encode(names, timestamps, values)),
+        )
+
+    def series(self, page_id, start, end, metrics=None, resolution=None, agg="mean"):
+        """Metric series of a page between two epoch times (inclusive).
+
+        Returns (timestamps, {metric: values}) as NumPy arrays, downsampled to
+        `resolution` ("hour", "day" or "week") with `agg` when given. Metrics not
+        recorded at a point in time are NaN.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT names, timestamps, vals FROM metric_history "
+                "WHERE page_id = ? AND day BETWEEN ? AND ? ORDER BY day",
+                (str(page_id), int(start // DAY), int(end // DAY)),
+            ).fetchall()
+        # Consecutive days almost always share a metric set: join those columns
+        # first and align each run to the requested metrics once
+        runs = []
+        for row in rows:
+            names, timestamps, values = _decode(row)
+            if runs and runs[-1][0] == names:
+                runs[-1][1].append(timestamps)
+                runs[-1][2].append(values)
+            else:
+                runs.append((names, [timestamps], [values]))
+        wanted = list(metrics) if metrics else sorted({name for names, _, _ in runs for name in names})
+        if not runs:
+            return np.empty(0), {name: np.empty(0) for name in wanted}
+        timestamps = np.concatenate([ts for _, run_ts, _ in runs for ts in run_ts])
+        values = np.concatenate(
+            [np.concatenate([_align(names, v, wanted) for v in run_values], axis=1) for names, _, run_values in runs],
+            axis=1,
+        )
+        # Only the first and last day can hold snapshots outside the range
+        first = np.searchsorted(timestamps, start, side="left")
+        last = np.searchsorted(timestamps, end, side="right")
+        timestamps, values = timestamps[first:last], values[:, first:last]
+        if resolution:
+            timestamps, values = downsample(timestamps, values, resolution, agg)
+        return timestamps, dict(zip(wanted, values))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,83 @@
+from facebook_metrics import new_metrics, new_post_row
+from graph import GraphClient, first_error
+from telemetry import span
+
+# Fields read while listing the media edge; likes and comments come with the listing
+MEDIA_FIELDS = "id,timestamp,media_type,like_count,comments_count,caption,permalink"
+# Insights per media type (video_views only exists for videos)
+MEDIA_INSIGHT_METRICS = {
+    'IMAGE': "reach,impressions,saved",
+    'CAROUSEL_ALBUM': "reach,impressions,saved",
+    'VIDEO': "reach,impressions,saved,video_views",
+}
+
+# Instagram insight name -> dashboard metric key
+MEDIA_INSIGHT_KEYS = {
+    "reach": "reach",
+    "impressions": "impressions",
+    "saved": "postSaves",
+    "video_views": "videoViews",
+}
+
+
+def add_media_insights(metrics, insights):
+    for item in insights.get("data", []):
+        key = MEDIA_INSIGHT_KEYS.get(item["name"])
+        if key:
+            value = item["values"][0]["value"]
+            metrics[key] = metrics.get(key, 0) + value
+
+
+def fetch_instagram_metrics(account_id, access_token, client=None, since=None, until=None,
+                            page_size=None, posts=None):
+    """Aggregate metrics over every media of an Instagram Business account.
+
+    Same snapshot format as fetch_facebook_organic_metrics: media reach,
+    impressions, likes, comments, saves and video views fill the matching keys
+    (Instagram has no paid or shared counts here, so those stay 0). Pass a list
+    as `posts` to also get one row per media (kind "instagram").
+    """
+    metrics = new_metrics()
+    params = {key: value for key, value in (('since', since), ('until', until), ('limit', page_size))
+              if value is not None}
+    owns_client = client is None
+    if owns_client:
+        client = GraphClient(access_token)
+    try:
+        media_pages = client.paginate(f"{account_id}/media", fields=MEDIA_FIELDS, **params)
+        while True:
+            with span("instagram_media_listing"):
+                media = next(media_pages, None)
+            if media is None:
+                break
+            # One batched insights lookup per media, on the client's shared pool
+            calls = [(f"{item['id']}/insights", {"metric": MEDIA_INSIGHT_METRICS.get(item.get('media_type'),
+                                                                                    MEDIA_INSIGHT_METRICS['IMAGE'])})
+                     for item in media]
+            with span("instagram_media_insights"):
+                results = client.batch(calls)
+            error = first_error(results)
+            if error is not None:
+                raise error
+            for item, insights in zip(media, results):
+                row = new_post_row(item.get('timestamp'))
+                row['likes'] = item.get('like_count', 0)
+                row['comments'] = item.get('comments_count', 0)
+                add_media_insights(row, insights)
+                # Instagram reports no paid distribution for organic media
+                row['organicImpressions'] = row['impressions']
+                metrics['postSaves'] += row.pop('postSaves', 0)
+                for key in ('reach', 'impressions', 'organicImpressions', 'likes', 'comments', 'videoViews'):
+                    metrics[key] += row[key]
+                if posts is not None:
+                    posts.append({
+                        **row,
+                        'id': item['id'],
+                        'kind': 'instagram',
+                        'text': item.get('caption'),
+                        'permalink_url': item.get('permalink'),
+                    })
+    finally:
+        if owns_client:
+            client.close()
+    return metrics
@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POST_STORE_PATH = os.getenv("POST_STORE_PATH", os.path.join(BASE_DIR, "post_metrics.db"))
+
+# Posts younger than this many seconds are still "hot" and get refetched on every
+# refresh; older posts are fetched one last time and then served from the store
+POST_HOT_WINDOW = float(os.getenv("POST_HOT_WINDOW", str(3 * 24 * 3600)))
+
+# Per-post metric columns, shared by posts and videos
+POST_METRIC_COLUMNS = [
+    'reach',
+    'impressions',
+    'organicImpressions',
+    'paidImpressions',
+    'likes',
+    'comments',
+    'shares',
+    'videoViews',
+    'tenSecondViews',
+    'averageWatchTime',
+    'videoRetentionRate',
+]
+
+
+def parse_graph_time(value):
+    """Graph timestamps look like 2024-05-01T12:00:00+0000; returns epoch seconds or None."""
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z").timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class PostMetricStore:
+    """SQLite store of per-post (and per-video) metrics keyed by object ID."""
+
+    def __init__(self, path=None, hot_window=None):
+        self.path = path or POST_STORE_PATH
+        self.hot_window = POST_HOT_WINDOW if hot_window is None else hot_window
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            columns = ", ".join(f'"{c}" REAL NOT NULL DEFAULT 0' for c in POST_METRIC_COLUMNS)
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS post_metrics (
+                    page_id TEXT NOT NULL,
+                    object_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    created_time REAL,
+                    fetched_at REAL NOT NULL,
+                    {columns},
+                    PRIMARY KEY (page_id, kind, object_id)
+                )
+            """)
+            self._conn.commit()
+        return self._conn
+
+    def stale_ids(self, page_id, kind, objects, now=None):
+        """Return the IDs among the listed Graph objects that need fetching.
+
+        An object needs fetching when it is not stored yet, or when its last fetch
+        happened while it was still inside the hot window.
+        """
+        now = time.time() if now is None else now
+        ids = [obj['id'] for obj in objects]
+        with self._lock:
+            rows = dict(self._connect().execute(
+                f"SELECT object_id, fetched_at FROM post_metrics WHERE page_id = ? AND kind = ? "
+                f"AND object_id IN ({', '.join('?' * len(ids))})",
+                [page_id, kind, *ids],
+            ).fetchall()) if ids else {}
+        stale = []
+        for obj in objects:
+            fetched_at = rows.get(obj['id'])
+            created = parse_graph_time(obj.get('created_time'))
+            if fetched_at is None or created is None or fetched_at < min(created + self.hot_window, now):
+                stale.append(obj['id'])
+        return stale
+
+    def upsert(self, page_id, kind, rows, now=None):
+        """Store {object_id: {column: value}} rows fetched at `now`."""
+        now = time.time() if now is None else now
+        columns = ", ".join(f'"{c}"' for c in POST_METRIC_COLUMNS)
+        placeholders = ", ".join("?" * (len(POST_METRIC_COLUMNS) + 5))
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                f"INSERT OR REPLACE INTO post_metrics (page_id, object_id, kind, created_time, fetched_at, {columns}) "
+                f"VALUES ({placeholders})",
+                [
+                    (page_id, object_id, kind, row.get('created_time'), now,
+                     *(row.get(c, 0) for c in POST_METRIC_COLUMNS))
+                    for object_id, row in rows.items()
+                ],
+            )
+            conn.commit()
+
+    def rows(self, page_id, kind=None, ids=None):
+        """Stored rows of a page as {object_id: {'kind', 'created_time', column: value}}.
+
+        Optionally limited to one kind and/or to the given object IDs.
+        """
+        if ids is not None and not ids:
+            return {}
+        columns = ", ".join(f'"{c}"' for c in POST_METRIC_COLUMNS)
+        query = f"SELECT object_id, kind, created_time, {columns} FROM post_metrics WHERE page_id = ?"
+        params = [page_id]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        if ids is not None:
+            query += f" AND object_id IN ({', '.join('?' * len(ids))})"
+            params.extend(ids)
+        with self._lock:
+            found = self._connect().execute(query, params).fetchall()
+        rows = {}
+        for object_id, object_kind, created_time, *values in found:
+            row = {c: int(v) if float(v).is_integer() else v for c, v in zip(POST_METRIC_COLUMNS, values)}
+            row['kind'] = object_kind
+            row['created_time'] = created_time
+            rows[object_id] = row
+        return rows
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,121 @@
+import base64
+import json
+from datetime import datetime, timezone
+
+import numpy as np
+
+from derived_metrics import compute_derived_metrics
+from post_store import POST_METRIC_COLUMNS
+
+# Derived metrics (see DERIVED_METRICS) that are meaningful for a single post
+POST_RATE_COLUMNS = [
+    'engagementRate',
+    'commentRate',
+    'shareRate',
+    'frequency',
+    'engagementByImpressions',
+    'videoCompletionRate',
+]
+# Inputs of DERIVED_METRICS only known for the whole page; zero for each post
+PAGE_ONLY_INPUTS = ('totalFollowers', 'websiteClicks', 'ctaClicks', 'postSaves', 'adSpend')
+
+# Columns /papi/posts can sort by; engagement is likes + comments + shares
+SORT_COLUMNS = ['created_time', 'engagement', *POST_RATE_COLUMNS, *POST_METRIC_COLUMNS]
+KINDS = ('post', 'video', 'instagram')
+
+
+def encode_cursor(value, object_id):
+    raw = json.dumps([value, object_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """(sort value, object id) of the last row of the previous page; ValueError when malformed."""
+    try:
+        value, object_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return float(value), str(object_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class PostTable:
+    """Immutable columnar table of one page's posts and videos.
+
+    Every sortable column is a NumPy array with an ascending and a descending
+    sort index computed once when the table is built (ties broken by object ID),
+    so a query only filters an index and slices it. Pagination is by keyset
+    cursor, which stays valid when the table is rebuilt by a refresh.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        self.ids = np.array([row['id'] for row in rows], dtype=str)
+        self.kinds = np.array([row['kind'] for row in rows], dtype=str)
+        self.texts = [row.get('text') for row in rows]
+        self.links = [row.get('permalink_url') for row in rows]
+        self.columns = {c: np.array([row.get(c, 0) for row in rows], dtype=np.float64) for c in POST_METRIC_COLUMNS}
+        # Objects without a creation time sort as the oldest
+        self.columns['created_time'] = np.array([row.get('created_time') or 0 for row in rows], dtype=np.float64)
+        # Per-post rates, from every post's columns at once
+        derived = compute_derived_metrics({
+            **{name: np.zeros(len(rows)) for name in PAGE_ONLY_INPUTS},
+            **{c: self.columns[c] for c in POST_METRIC_COLUMNS},
+        })
+        self.columns['engagement'] = derived['engagementTotal']
+        for name in POST_RATE_COLUMNS:
+            self.columns[name] = derived[name]
+
+        id_rank = np.argsort(np.argsort(self.ids, kind="stable"), kind="stable")
+        self.indexes = {}
+        for name in SORT_COLUMNS:
+            values = self.columns[name]
+            self.indexes[name, "asc"] = np.lexsort((id_rank, values))
+            self.indexes[name, "desc"] = np.lexsort((id_rank, -values))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, i):
+        created = self.columns['created_time'][i]
+        row = {
+            'id': str(self.ids[i]),
+            'kind': str(self.kinds[i]),
+            'created_time': datetime.fromtimestamp(created, timezone.utc).isoformat() if created else None,
+            'text': self.texts[i],
+            'permalink_url': self.links[i],
+        }
+        for name in ['engagement', *POST_RATE_COLUMNS, *POST_METRIC_COLUMNS]:
+            value = self.columns[name][i].item()
+            row[name] = int(value) if value.is_integer() else value
+        return row
+
+    def query(self, sort='created_time', order='desc', kind=None, since=None, until=None, limit=25, cursor=None):
+        """One page of rows sorted by `sort`, optionally filtered by kind and creation time.
+
+        Returns (rows, next_cursor, total) where total counts every row matching
+        the filters and next_cursor is None on the last page.
+        """
+        index = self.indexes[sort, order]
+        mask = np.ones(len(self), dtype=bool)
+        if kind is not None:
+            mask &= self.kinds == kind
+        created = self.columns['created_time']
+        if since is not None:
+            mask &= created >= since
+        if until is not None:
+            mask &= created <= until
+        index = index[mask[index]]
+        total = len(index)
+
+        if cursor is not None:
+            value, object_id = decode_cursor(cursor)
+            values, ids = self.columns[sort][index], self.ids[index]
+            beyond = values < value if order == 'desc' else values > value
+            index = index[beyond | ((values == value) & (ids > object_id))]
+
+        page = index[:limit]
+        next_cursor = None
+        if len(index) > limit:
+            last = page[-1]
+            next_cursor = encode_cursor(self.columns[sort][last].item(), str(self.ids[last]))
+        return [self.row(i) for i in page], next_cursor, total
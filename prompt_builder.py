@@ -0,0 +1,82 @@
+import json
+
+try:
+    # Optional: exact token counts when tiktoken is installed, an estimate otherwise
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Metrics each insight is written from; the prompts only carry their union
+INSIGHT_METRICS = {
+    "engagementRateInsight": [
+        "engagementRate", "engagementTotal", "engagementByImpressions", "reach", "impressions",
+    ],
+    "reachInsight": [
+        "reach", "impressions", "organicImpressions", "paidImpressions", "frequency",
+        "reachRate", "totalFollowers", "audienceSaturation",
+    ],
+    "breakdownInsight": [
+        "likes", "comments", "shares", "applauseRate", "conversationRate", "amplificationRate",
+        "commentRate", "shareRate", "saveRate", "videoViews", "tenSecondViews",
+        "videoCompletionRate", "videoEngagementRate",
+    ],
+    "summaryInsight": [
+        "reach", "impressions", "engagementTotal", "engagementRate", "totalFollowers", "videoViews",
+    ],
+}
+
+# Metrics that are still placeholders (no Graph source or a fixed stand-in value)
+# and would only mislead the model
+PLACEHOLDER_METRICS = {
+    "websiteClicks", "ctaClicks", "postSaves", "adSpend", "adRelevanceScore",
+    "impressionShare", "totalAvailableImpressions", "clickThroughRate", "conversionRate",
+    "costPerClick", "costPerMille", "returnOnAdSpend", "revenuePerClick",
+    "customerAcquisitionCost", "costPerAcquisition", "bidEfficiency",
+    "dailyBudgetUtilization", "optimizationScore", "learningEfficiency", "incrementalROAS",
+    "videoCTR", "averagePercentageViewed",
+}
+
+# Evaluator feedback carried into the next generator prompt is capped at this length
+MAX_FEEDBACK_CHARS = 600
+
+_encoding = None
+
+
+def select_metrics(metrics, insight_keys=None):
+    """The non-zero, non-placeholder metrics the given insights are written from."""
+    wanted = []
+    for key in insight_keys or INSIGHT_METRICS:
+        wanted.extend(name for name in INSIGHT_METRICS.get(key, []) if name not in wanted)
+    return {
+        name: metrics[name] for name in wanted
+        if name not in PLACEHOLDER_METRICS and metrics.get(name) not in (None, 0, "")
+    }
+
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def prompt_metrics(metrics, insight_keys=None):
+    """Compact JSON of the metrics a prompt needs ("{}" when nothing is non-zero)."""
+    return compact_json(select_metrics(metrics, insight_keys))
+
+
+def trim_feedback(feedback):
+    feedback = (feedback or "").strip()
+    if len(feedback) > MAX_FEEDBACK_CHARS:
+        feedback = feedback[:MAX_FEEDBACK_CHARS].rsplit(" ", 1)[0] + "..."
+    return feedback
+
+
+def count_tokens(text, model="gpt-3.5-turbo"):
+    """Prompt token count: exact with tiktoken, otherwise ~4 characters per token."""
+    global _encoding
+    if tiktoken is None:
+        return (len(text) + 3) // 4
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode(text))
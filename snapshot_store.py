@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+
+def write_snapshot(path, data):
+    """Atomically replace the file at `path` with `data` (bytes).
+
+    The data goes to a temporary file in the same directory which is then renamed
+    over `path`, so concurrent readers see either the old or the new snapshot,
+    never a partial one.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def read_snapshot(path, version=None):
+    """Read a snapshot file unless it is still at `version`.
+
+    Returns (data, mtime, version), or None when the file is missing or
+    unchanged. The version (inode, mtime, size) is taken from the opened file,
+    so it always matches the data even if the file is replaced meanwhile.
+    """
+    try:
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            current = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if current == version:
+                return None
+            return f.read(), stat.st_mtime, current
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,74 @@
+import mimetypes
+import os
+import threading
+
+from dotenv import load_dotenv
+from fastapi.responses import Response
+
+from cached_response import CachedBody
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Seconds browsers may reuse a static asset without revalidating it; requests that
+# name the asset's content hash (?v=<hash>) may keep it for a year
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "86400"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Assets whose URL never changes across deploys (the dashboard shell) are always
+# revalidated, so a new version shows up on the next load
+REVALIDATE = {".html"}
+
+
+def media_type(name):
+    guessed = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if guessed.startswith("text/") or guessed in ("application/json", "application/javascript"):
+        guessed += "; charset=utf-8"
+    return guessed
+
+
+class StaticAssets:
+    """The files of a directory read, compressed (gzip, brotli) and hashed once, then served from memory.
+
+    Every asset is a CachedBody, so it carries a content-hashed ETag and answers
+    conditional requests with 304. Files are loaded on the first lookup unless
+    load() ran before (at startup); restart to pick up edited files.
+    """
+
+    def __init__(self, directory, max_age=None):
+        self.directory = directory
+        self.max_age = STATIC_MAX_AGE if max_age is None else max_age
+        self._assets = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        assets = {}
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                name = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                with open(path, 'rb') as f:
+                    data = f.read()
+                cache_control = "no-cache" if os.path.splitext(name)[1] in REVALIDATE else \
+                    f"public, max-age={self.max_age}"
+                assets[name] = CachedBody(data, media_type=media_type(name), last_modified=os.path.getmtime(path),
+                                          cache_control=cache_control)
+        self._assets = assets
+        return assets
+
+    def get(self, name):
+        if self._assets is None:
+            with self._lock:
+                if self._assets is None:
+                    self.load()
+        return self._assets.get(name)
+
+    def respond(self, request, name):
+        asset = self.get(name)
+        if asset is None:
+            return Response(status_code=404)
+        headers = None
+        if request.query_params.get("v") == asset.etag.strip('"'):
+            # The URL changes with the content, so the response never goes stale
+            headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        return asset.respond(request, headers=headers)
@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Seconds buckets wide enough for both a single Graph page and a whole refresh
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "pipeline_stage_seconds", "Time spent in each stage of the metrics pipeline", ["stage"], buckets=STAGE_BUCKETS)
+STAGE_ERRORS = Counter(
+    "pipeline_stage_errors_total", "Pipeline stages that raised", ["stage"])
+
+GRAPH_REQUESTS = Counter(
+    "graph_requests_total", "Graph API calls (batch sub-requests included) by outcome", ["endpoint", "outcome"])
+GRAPH_RETRIES = Counter(
+    "graph_retries_total", "Graph API calls retried after a transient failure", ["endpoint"])
+GRAPH_CACHE = Counter(
+    "graph_cache_total", "Graph GET responses served from the response cache (hit) or the API (miss)",
+    ["endpoint", "result"])
+GRAPH_SECONDS = Histogram(
+    "graph_request_seconds", "Graph API HTTP request latency", ["endpoint"], buckets=STAGE_BUCKETS)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total", "Tokens used by the agents", ["agent", "kind"])
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "Requests served by the API", ["method", "route", "status"])
+HTTP_SECONDS = Histogram(
+    "http_request_seconds", "Time to produce API responses (streams: until headers)", ["method", "route"])
+
+
+@contextmanager
+def span(stage):
+    """Time a block into pipeline_stage_seconds{stage=...}; failures also count in pipeline_stage_errors_total."""
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - started)
+
+
+def exposition():
+    """The current values of every metric, in the Prometheus text format: (body, content type)."""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class HTTPMetricsMiddleware:
+    """ASGI middleware counting requests into http_requests_total / http_request_seconds.
+
+    Requests are labelled with the route template (e.g. "/papi/posts"), never the
+    raw path, so unknown URLs all land under "unmatched". Plain ASGI rather than
+    BaseHTTPMiddleware so event streams pass through untouched.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Streams stay open for minutes; time them until their headers go out
+                HTTP_SECONDS.labels(scope["method"], _route(scope)).observe(time.perf_counter() - started)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            HTTP_REQUESTS.labels(scope["method"], _route(scope), str(status)).inc()
+
+
+def _route(scope):
+    # The router stores the matched route in the scope
+    return getattr(scope.get("route"), "path", None) or "unmatched"
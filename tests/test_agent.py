@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+import agent
+from benchmarks.mock_openai import MockOpenAIServer
+
+METRICS = {"reach": 10000, "engagementRate": 5.2, "likes": 300, "comments": 50, "shares": 20}
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    """A local fake OpenAI endpoint the async client is pointed at."""
+    def start(**kwargs):
+        server = MockOpenAIServer(**kwargs).start()
+        servers.append(server)
+        monkeypatch.setenv("OPENAI_BASE_URL", server.url)
+        return server
+
+    servers = []
+    monkeypatch.setattr(agent, "OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(agent, "_async_client", None)
+    monkeypatch.setattr(agent, "EVALUATOR_MODE", "hybrid")
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def run(**kwargs):
+    return asyncio.run(agent.run_agentic_analysis_async(METRICS, **kwargs))
+
+
+def test_passing_analysis_is_returned(openai_server):
+    server = openai_server(latency=0, feedback_rounds=1)
+    analysis, evaluation = run(call_timeout=5, budget=10)
+    assert evaluation is None
+    assert set(analysis) == set(agent.REQUIRED_INSIGHT_KEYS)
+    # One feedback round: two generations and two evaluations
+    assert server.request_count == 4
+
+
+def test_missing_api_key_is_reported(monkeypatch):
+    monkeypatch.setattr(agent, "OPENAI_API_KEY", None)
+    monkeypatch.setattr(agent, "_async_client", None)
+    analysis, evaluation = run(call_timeout=5, budget=10)
+    assert analysis is None
+    assert evaluation["status"] == "error"
+    assert "OPENAI_API_KEY" in evaluation["raw"]
+    assert "timeout" not in evaluation["raw"]
+
+
+def test_timeouts_are_reported_as_timeouts(openai_server):
+    openai_server(latency=1)
+    analysis, evaluation = run(call_timeout=0.1, budget=5, candidates=2)
+    assert analysis is None
+    assert evaluation == {
+        "status": "error",
+        "raw": "No analysis generated within the call timeout or latency budget.",
+    }
+
+
+def test_last_draft_is_returned_when_the_budget_runs_out(openai_server):
+    # Every evaluation asks for changes; the budget covers one round but not the next generation
+    server = openai_server(latency=0.5, feedback_rounds=100)
+    analysis, evaluation = run(call_timeout=5, budget=1.25)
+    assert set(analysis) == set(agent.REQUIRED_INSIGHT_KEYS)
+    assert evaluation == {
+        "status": "error",
+        "raw": "No analysis generated within the call timeout or latency budget.",
+    }
+    assert server.request_count == 3
+
+
+def test_failure_note_prefers_real_errors_over_timeouts():
+    note = agent.failure_note("No analysis generated", [asyncio.TimeoutError(), PermissionError("401 Unauthorized")])
+    assert note == "No analysis generated: PermissionError: 401 Unauthorized"
@@ -0,0 +1,42 @@
+from analysis_checks import MISSING_INSIGHT, check_analysis, quoted_figures
+
+METRICS = {"reach": 10000, "engagementRate": 5.2, "likes": 300, "comments": 50}
+
+ANALYSIS = {
+    "engagementRateInsight": "Engagement rate is 5.2%; keep posting at this cadence and aim to keep it above 10%.",
+    "reachInsight": "Reach of 10K came mostly from video posts; schedule more short videos each week.",
+    "breakdownInsight": "Likes (300) dominate engagement; ask questions to grow comments by 20%.",
+    "summaryInsight": "A solid month overall; focus on video and conversation starters next month.",
+}
+
+
+def test_cited_metric_values_pass():
+    assert check_analysis(METRICS, ANALYSIS) is None
+
+
+def test_targets_are_not_checked_as_citations():
+    for text in ["aim to keep it above 10%", "grow comments by 20%", "target a 15% lift in shares",
+                 "target 1,500 likes", "a goal of 2,000 shares", "post daily to reach at least 12.5K people",
+                 "ask questions to boost shares by 15%", "a 25% target for next month"]:
+        assert quoted_figures(text) == [], text
+
+
+def test_changes_that_happened_are_checked():
+    text = "Reach climbed to 50,000 people this month and engagement rose by 12.5%; keep it up."
+    assert [written for written, _, _ in quoted_figures(text)] == ["50,000", "12.5%"]
+    feedback = check_analysis(METRICS, {**ANALYSIS, "reachInsight": text})
+    assert "reachInsight quotes figures that are not in the metrics: 50,000, 12.5%" in feedback
+
+
+def test_wrong_figures_are_reported():
+    analysis = {**ANALYSIS, "reachInsight": "Reach of 12,500 came mostly from video posts; schedule more videos."}
+    feedback = check_analysis(METRICS, analysis)
+    assert "reachInsight quotes figures that are not in the metrics: 12,500" in feedback
+
+
+def test_missing_and_foreign_insights_are_reported():
+    analysis = {**ANALYSIS, "summaryInsight": MISSING_INSIGHT,
+                "reachInsight": "Eachray ashay owngray ithway ideovay ostspay eekway."}
+    feedback = check_analysis(METRICS, analysis)
+    assert "Missing or empty insights: summaryInsight" in feedback
+    assert "reachInsight is not written in clear, standard English" in feedback
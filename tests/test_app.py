@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """The API without its lifespan (no scheduler), serving one page whose crawls are recorded."""
+    crawls = []
+    monkeypatch.setattr(app, "pages", {"101": "token-101"})
+    monkeypatch.setattr(app, "collect_metrics", lambda *args, **kwargs: crawls.append((args, kwargs)) or {"reach": 1})
+    client = TestClient(app.app)
+    client.crawls = crawls
+    return client
+
+
+@pytest.mark.parametrize("query", ["since=yesterday", "until=2024-13-01", "since=nan",
+                                   "since=2024-05-02&until=2024-05-01"])
+def test_bad_ranges_are_rejected(client, query):
+    response = client.get(f"/papi/facebook-metrics?page_id=101&{query}")
+    assert response.status_code == 400
+    assert client.crawls == []
+
+
+def test_range_is_sent_as_timestamps(client):
+    response = client.get("/papi/facebook-metrics?page_id=101&since=2024-05-01&until=2024-05-01")
+    assert response.status_code == 200
+    (page, token, since, until, page_size), _ = client.crawls[0]
+    assert (since, until) == (1714521600, 1714521600 + 86400 - 1)
+
+
+@pytest.mark.parametrize("collector, uses_store", [("inline", True), ("external", False)])
+def test_external_workers_leave_the_post_store_to_the_collector(client, monkeypatch, collector, uses_store):
+    monkeypatch.setattr(app, "METRICS_COLLECTOR", collector)
+    assert client.get("/papi/facebook-metrics?page_id=101&since=2024-05-01").status_code == 200
+    _, kwargs = client.crawls[0]
+    assert kwargs["store"] is (app.post_store if uses_store else None)
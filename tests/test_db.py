@@ -0,0 +1,162 @@
+import pytest
+
+import db
+
+PAGES = {"101": "token-101", "102": "token-102"}
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        sql = " ".join(sql.split())
+        self.conn.statements.append(sql)
+        self.conn.params.append(params)
+        if sql.startswith("EXECUTE credentials_by_page"):
+            self.rows = [(page_id, PAGES[page_id]) for page_id in params[0] if page_id in PAGES]
+        elif sql.startswith("EXECUTE all_settings"):
+            self.rows = list(PAGES.items())
+
+    def fetchall(self):
+        return self.rows
+
+
+class FakeConnection:
+    """Records the SQL it runs and answers the prepared lookups from PAGES."""
+
+    def __init__(self):
+        self.statements = []
+        self.params = []
+        self.closed = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+    def queries(self, prefix):
+        return sum(statement.startswith(prefix) for statement in self.statements)
+
+
+class FakePool:
+    created = 0
+
+    def __init__(self, minconn, maxconn, **config):
+        FakePool.created += 1
+        self.conn = FakeConnection()
+        self.borrowed = 0
+
+    def getconn(self):
+        self.borrowed += 1
+        return self.conn
+
+    def putconn(self, conn, close=False):
+        pass
+
+    def closeall(self):
+        self.conn.close()
+
+
+@pytest.fixture(autouse=True)
+def fake_pool(monkeypatch):
+    monkeypatch.setattr(db.psycopg2.pool, "ThreadedConnectionPool", FakePool)
+    for name, value in (("db_host", "localhost"), ("db_port", "5432"), ("db_name", "test"),
+                        ("db_user", "test"), ("db_password", "test")):
+        monkeypatch.setattr(db, name, value)
+    monkeypatch.setattr(FakePool, "created", 0)
+    db.close_pool()
+    db.invalidate_credentials()
+    yield
+    db.close_pool()
+    db.invalidate_credentials()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_pool_is_created_once_and_reused():
+    assert db.get_pool() is db.get_pool()
+    db.get_page_credentials_many(["101"])
+    db.fetch_all_facebook_settings()
+    pool = db.get_pool()
+    assert FakePool.created == 1
+    assert pool.borrowed == 2
+    # Each statement is prepared once per pooled connection
+    db.invalidate_credentials()
+    db.get_page_credentials_many(["102"])
+    assert pool.conn.queries("PREPARE credentials_by_page") == 1
+    assert pool.conn.queries("EXECUTE credentials_by_page") == 2
+
+
+def test_bulk_lookup_reads_uncached_pages_in_one_query():
+    db.get_page_credentials("101")
+    assert db.get_page_credentials_many(["101", "102"]) == PAGES
+    conn = db.get_pool().conn
+    assert conn.queries("EXECUTE credentials_by_page") == 2
+    assert conn.params[-1] == (["102"],)
+
+
+def test_credentials_are_cached_until_the_ttl(clock):
+    assert db.get_page_credentials("101") == "token-101"
+    clock[0] += db.CREDENTIALS_CACHE_TTL - 1
+    assert db.get_page_credentials("101") == "token-101"
+    conn = db.get_pool().conn
+    assert conn.queries("EXECUTE credentials_by_page") == 1
+    clock[0] += 2
+    assert db.get_page_credentials("101") == "token-101"
+    assert conn.queries("EXECUTE credentials_by_page") == 2
+
+
+def test_unknown_pages_are_cached_for_the_miss_ttl(clock):
+    assert db.get_page_credentials("999") is None
+    assert db.get_page_credentials("999") is None
+    conn = db.get_pool().conn
+    assert conn.queries("EXECUTE credentials_by_page") == 1
+    clock[0] += db.CREDENTIALS_MISS_TTL + 1
+    assert db.get_page_credentials("999") is None
+    assert conn.queries("EXECUTE credentials_by_page") == 2
+
+
+def test_invalidate_forgets_one_page():
+    db.get_page_credentials_many(["101", "102"])
+    db.invalidate_credentials("101")
+    assert db.get_page_credentials_many(["101", "102"]) == PAGES
+    conn = db.get_pool().conn
+    assert conn.queries("EXECUTE credentials_by_page") == 2
+    assert conn.params[-1] == (["101"],)
+
+
+def test_fetch_all_fills_the_cache():
+    assert db.fetch_all_facebook_settings() == PAGES
+    db.get_page_credentials_many(["101", "102"])
+    assert db.get_pool().conn.queries("EXECUTE credentials_by_page") == 0
+
+
+def test_failed_transaction_forgets_prepared_statements():
+    db.get_page_credentials("101")
+    with pytest.raises(RuntimeError):
+        with db.connection():
+            raise RuntimeError("statement failed")
+    conn = db.get_pool().conn
+    assert conn.statements[-1] == "DEALLOCATE ALL"
+    db.get_page_credentials("102")
+    assert conn.queries("PREPARE credentials_by_page") == 2
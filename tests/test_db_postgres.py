@@ -0,0 +1,86 @@
+"""db.py against a real PostgreSQL server.
+
+Runs only when TEST_DATABASE_URL points at a database the tests may create a
+scratch schema in, e.g. TEST_DATABASE_URL=postgresql://postgres@localhost/test.
+"""
+import os
+import uuid
+
+import pytest
+
+import db
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL, reason="TEST_DATABASE_URL is not set")
+
+ROWS = [
+    ("101", "token-101"),
+    ("102", "token-102"),
+    ("10'3", "token-quoted"),  # adapted as an array element, not pasted into the SQL
+    ("104", None),  # configured without a token
+]
+
+
+@pytest.fixture(autouse=True)
+def database(monkeypatch):
+    """A facebook_settings table in a throwaway schema, with the pool pointed at it."""
+    schema = f"test_db_{uuid.uuid4().hex[:12]}"
+    admin = db.psycopg2.connect(TEST_DATABASE_URL)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {schema}")
+        cursor.execute(f"""
+            CREATE TABLE {schema}.facebook_settings (
+                id serial PRIMARY KEY,
+                page_id text,
+                page_access_token text
+            )
+        """)
+        cursor.executemany(f"INSERT INTO {schema}.facebook_settings (page_id, page_access_token) VALUES (%s, %s)",
+                           ROWS)
+    monkeypatch.setattr(db, "db_config", lambda: {"dsn": TEST_DATABASE_URL,
+                                                  "options": f"-c search_path={schema}"})
+    db.close_pool()
+    db.invalidate_credentials()
+    yield
+    db.close_pool()
+    db.invalidate_credentials()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {schema} CASCADE")
+    admin.close()
+
+
+def prepared_statements():
+    with db.connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT name FROM pg_prepared_statements")
+            return {name for name, in cursor.fetchall()}
+
+
+def test_bulk_lookup_binds_the_page_ids_as_an_array():
+    assert db.get_page_credentials_many(["101", "10'3", "104", "999"]) == {
+        "101": "token-101",
+        "10'3": "token-quoted",
+    }
+    assert db.get_page_credentials("102") == "token-102"
+    assert prepared_statements() == {"credentials_by_page"}
+
+
+def test_prepared_lookups_run_on_the_server():
+    with db.connection() as conn:
+        assert db.execute_prepared(conn, "settings_by_id", (2,)) == [("102", "token-102")]
+    assert db.fetch_all_facebook_settings() == {"101": "token-101", "102": "token-102", "10'3": "token-quoted"}
+    assert prepared_statements() == {"settings_by_id", "all_settings"}
+
+
+def test_failed_transaction_deallocates_prepared_statements():
+    db.get_page_credentials("101")
+    with pytest.raises(db.psycopg2.Error):
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT * FROM no_such_table")
+    assert prepared_statements() == set()
+    # The lookup is prepared again on the same connection instead of failing as a duplicate
+    db.invalidate_credentials()
+    assert db.get_page_credentials("101") == "token-101"
@@ -0,0 +1,68 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from facebook_metrics import fetch_facebook_organic_metrics
+from graph import GraphError
+from post_store import PostMetricStore
+
+CREATED = datetime.fromtimestamp(time.time() - 3600, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+
+class StubClient:
+    """Lists two posts and no videos; lookups of the IDs in `failing` fail."""
+
+    def __init__(self, likes):
+        self.likes = likes
+        self.failing = set()
+        self.looked_up = []
+
+    def paginate(self, path, **params):
+        if path.endswith("/posts"):
+            yield [{"id": post_id, "created_time": CREATED} for post_id in self.likes]
+
+    def batch(self, calls):
+        results = []
+        for object_id, _ in calls:
+            self.looked_up.append(object_id)
+            if object_id in self.failing:
+                results.append(GraphError(f"Graph API {{id}}: lookup of {object_id} failed", code=2))
+            else:
+                results.append({"likes": {"summary": {"total_count": self.likes[object_id]}}})
+        return results
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PostMetricStore(path=str(tmp_path / "posts.db"))
+    yield store
+    store.close()
+
+
+def test_failed_lookup_keeps_the_stored_row(store):
+    client = StubClient({"p1": 5, "p2": 7})
+    assert fetch_facebook_organic_metrics("page", "token", client=client, store=store)["likes"] == 12
+
+    client.likes = {"p1": 9, "p2": 8}
+    client.failing = {"p1"}
+    with pytest.raises(GraphError):
+        fetch_facebook_organic_metrics("page", "token", client=client, store=store)
+    # p1 keeps its last good row instead of being zeroed; p2 was fetched and saved
+    rows = store.rows("page", "post")
+    assert rows["p1"]["likes"] == 5 and rows["p2"]["likes"] == 8
+
+
+def test_failed_lookup_is_retried_on_the_next_refresh(store):
+    # Outside the hot window a post is fetched once and then only read from the store
+    store.hot_window = 0
+    client = StubClient({"p1": 5, "p2": 7})
+    client.failing = {"p1"}
+    with pytest.raises(GraphError):
+        fetch_facebook_organic_metrics("page", "token", client=client, store=store)
+    assert "p1" not in store.rows("page", "post")
+
+    client.failing = set()
+    client.looked_up.clear()
+    assert fetch_facebook_organic_metrics("page", "token", client=client, store=store)["likes"] == 12
+    assert client.looked_up == ["p1"]
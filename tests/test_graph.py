@@ -0,0 +1,139 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import graph
+
+
+class FakeResponse:
+    def __init__(self, body, status_code=200, headers=None):
+        self.body = body
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def json(self):
+        return self.body
+
+
+class BatchSession:
+    """Answers batch POSTs; sub-requests for paths in `failing` get a Graph error."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.requests = 0
+
+    def request(self, method, url, timeout=None, data=None, **kwargs):
+        self.requests += 1
+        items = []
+        for call in json.loads(data["batch"]):
+            path = call["relative_url"].split("?")[0]
+            if path in self.failing:
+                error = {"error": {"message": "Unsupported get request", "code": 100}}
+                items.append({"code": 400, "body": json.dumps(error)})
+            else:
+                items.append({"code": 200, "body": json.dumps({"id": path})})
+        return FakeResponse(items)
+
+    def close(self):
+        pass
+
+
+def client_for(session, **kwargs):
+    # A fresh token per client, so the throttle is not shared between tests
+    client = graph.GraphClient(f"token-{uuid.uuid4().hex}", base_url="http://graph.test/v18.0",
+                               max_workers=1, max_retries=0, **kwargs)
+    client.session = session
+    return client
+
+
+def test_failed_batch_calls_come_back_as_errors():
+    client = client_for(BatchSession(failing={"2/insights"}), cache=None)
+    results = client.batch([("1/insights", {}), ("2/insights", {}), ("3/insights", {})])
+    assert results[0] == {"id": "1/insights"} and results[2] == {"id": "3/insights"}
+    assert isinstance(results[1], graph.GraphError)
+    assert results[1].code == 100
+    assert graph.first_error(results) is results[1]
+    assert graph.first_error(results[::2]) is None
+
+
+def test_failed_batch_calls_are_not_cached():
+    session = BatchSession(failing={"2/insights"})
+    client = client_for(session, cache=graph.GraphCache(ttl=60))
+    client.batch([("1/insights", {}), ("2/insights", {})])
+    session.failing.clear()
+    assert client.batch([("1/insights", {}), ("2/insights", {})]) == [{"id": "1/insights"}, {"id": "2/insights"}]
+    # Only the call that failed is sent again
+    assert session.requests == 2
+
+
+def test_long_pause_fails_calls_instead_of_waiting():
+    session = BatchSession()
+    client = client_for(session, cache=None)
+    client._throttle.pause(graph.GRAPH_MAX_PAUSE + 60)
+    with pytest.raises(graph.GraphError, match="rate limited"):
+        client.batch([("1/insights", {})])
+    assert session.requests == 0
+
+
+def run_flight(cache, endpoint, load, callers=5):
+    """fetch() the same key from several threads while the first load is held open.
+
+    Returns each caller's value or exception once every follower is waiting on
+    the leader's load (followers count as cache hits before they wait).
+    """
+    release = threading.Event()
+
+    def held():
+        release.wait(5)
+        return load()
+
+    def call(_):
+        try:
+            return cache.fetch(("scope", endpoint), endpoint, held)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        futures = [pool.submit(call, i) for i in range(callers)]
+        deadline = time.monotonic() + 5
+        while graph.graph_stats.snapshot().get(endpoint, {}).get("cache_hits", 0) < callers - 1:
+            assert time.monotonic() < deadline, "followers never joined the flight"
+            time.sleep(0.01)
+        release.set()
+        return [future.result() for future in futures]
+
+
+def test_concurrent_misses_share_one_load():
+    loads = []
+    results = run_flight(graph.GraphCache(ttl=60), f"test-{uuid.uuid4().hex}", lambda: loads.append(1) or {"id": "1"})
+    assert loads == [1]
+    assert results == [{"id": "1"}] * 5
+
+
+def test_load_error_reaches_every_waiter_and_is_not_cached():
+    cache = graph.GraphCache(ttl=60)
+    endpoint = f"test-{uuid.uuid4().hex}"
+    error = graph.GraphError("Graph API {id}: boom", code=2)
+    loads = []
+
+    def failing():
+        loads.append(1)
+        raise error
+
+    assert run_flight(cache, endpoint, failing) == [error] * 5
+    assert loads == [1]
+    # The next call loads again instead of replaying the failure
+    assert cache.fetch(("scope", endpoint), endpoint, lambda: loads.append(2) or {"id": "2"}) == {"id": "2"}
+    assert loads == [1, 2]
+
+
+def test_cache_disabled_for_an_endpoint_loads_every_time():
+    cache = graph.GraphCache(ttl=60, ttls={"{id}/posts": 0})
+    loads = []
+    for _ in range(2):
+        cache.fetch(("scope", "p"), "{id}/posts", lambda: loads.append(1) or {})
+    assert loads == [1, 1]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from history_store import DAY, MetricHistoryStore, downsample, numeric_metrics, series_json
+
+T0 = 20000 * DAY  # midnight UTC
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricHistoryStore(path=str(tmp_path / "history.db"))
+    yield store
+    store.close()
+
+
+def assert_series(actual, expected):
+    np.testing.assert_array_equal(actual, np.array(expected, dtype=float))
+
+
+def test_snapshots_with_different_metrics_are_merged(store):
+    store.append("101", {"reach": 10, "likes": 1, "summaryInsight": "text"}, ts=T0 + 600)
+    # A backfilled snapshot, older than the stored one and with a metric it lacks
+    store.append("101", {"likes": 2, "shares": 5}, ts=T0 + 300)
+    store.append("101", {"reach": 30, "instagram": {"reach": 7}}, ts=T0 + DAY + 60)
+
+    timestamps, series = store.series("101", T0, T0 + 2 * DAY)
+    assert_series(timestamps, [T0 + 300, T0 + 600, T0 + DAY + 60])
+    assert sorted(series) == ["instagram.reach", "likes", "reach", "shares"]
+    assert_series(series["reach"], [np.nan, 10, 30])
+    assert_series(series["likes"], [2, 1, np.nan])
+    assert_series(series["shares"], [5, np.nan, np.nan])
+    assert_series(series["instagram.reach"], [np.nan, np.nan, 7])
+
+
+def test_requested_metrics_and_range_bounds(store):
+    store.extend("101", [T0, T0 + 60, T0 + 120], {"reach": [1, 2, 3]})
+    timestamps, series = store.series("101", T0 + 60, T0 + 120, metrics=["reach", "unknown"])
+    assert_series(timestamps, [T0 + 60, T0 + 120])
+    assert_series(series["reach"], [2, 3])
+    assert_series(series["unknown"], [np.nan, np.nan])
+    assert store.series("102", T0, T0 + DAY)[0].size == 0
+
+
+def test_downsampling_skips_missing_values():
+    timestamps = np.array([T0, T0 + 60, T0 + 3600, T0 + 3660, T0 + 7200], dtype=float)
+    values = np.array([
+        [1, 3, np.nan, 4, np.nan],
+        [np.nan, np.nan, np.nan, np.nan, 9],
+    ])
+    buckets, mean = downsample(timestamps, values, "hour")
+    assert_series(buckets, [T0, T0 + 3600, T0 + 7200])
+    assert_series(mean, [[2, 4, np.nan], [np.nan, np.nan, 9]])
+    _, low = downsample(timestamps, values, "hour", "min")
+    _, high = downsample(timestamps, values, "hour", "max")
+    assert_series(low[0], [1, 4, np.nan])
+    assert_series(high[0], [3, 4, np.nan])
+
+
+def test_weeks_start_on_monday(store):
+    monday = 4 * DAY + 2000 * 7 * DAY
+    store.extend("101", [monday - 60, monday + 60, monday + 6 * DAY], {"reach": [1, 2, 4]})
+    timestamps, series = store.series("101", monday - DAY, monday + 7 * DAY, resolution="week", agg="last")
+    assert_series(timestamps, [monday - 7 * DAY, monday])
+    assert_series(series["reach"], [1, 4])
+
+
+def test_missing_values_are_null_in_json():
+    body = series_json(np.array([T0, T0 + 60.0]), {"reach": np.array([1.5, np.nan])})
+    assert body == {"timestamps": [T0, T0 + 60], "series": {"reach": [1.5, None]}}
+
+
+def test_only_numbers_are_tracked():
+    metrics = {"reach": 1, "live": True, "note": "x", "instagram": {"reach": 2.5}}
+    assert numeric_metrics(metrics) == {"reach": 1.0, "instagram.reach": 2.5}